@@ -0,0 +1,127 @@
+"""Micro-benchmark: compiled intent matcher vs the original keyword scans
+
+Run from the repo root:
+
+    python benchmarks/bench_intent.py
+
+Checks that both give the same intent for every question, then times them.
+"""
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from index import INTENT_KEYWORDS, match_question
+
+
+def legacy_detect_intent(question):
+    """detect_intent as it was before the compiled matcher: one scan per keyword list"""
+    q = question.lower().strip()
+    
+    # DISCOUNT queries with numeric conditions (check very early)
+    if any(word in q for word in ["more than", "greater than", "above", "zyada", "jyada"]) and any(word in q for word in ["discount", "concession", "chhoot"]):
+        return "DISCOUNT_MORE_THAN"
+    
+    if any(word in q for word in ["less than", "below", "under", "kam", "niche"]) and any(word in q for word in ["discount", "concession", "chhoot"]):
+        return "DISCOUNT_LESS_THAN"
+    
+    if "between" in q and any(word in q for word in ["discount", "concession", "chhoot"]):
+        return "DISCOUNT_BETWEEN"
+    
+    if any(word in q for word in ["more than", "greater than", "above", "zyada", "jyada"]) and any(word in q for word in ["paid", "fees", "fee", "payment"]):
+        return "FEES_MORE_THAN"
+    
+    if any(word in q for word in ["less than", "below", "under", "kam", "niche"]) and any(word in q for word in ["paid", "fees", "fee", "payment"]):
+        return "FEES_LESS_THAN"
+    
+    if "between" in q and any(word in q for word in ["paid", "fees", "fee", "payment"]):
+        return "FEES_BETWEEN"
+    
+    # ELIGIBLE queries (check early - specific)
+    if any(word in q for word in ["not eligible", "ineligible", "eligible nahi"]):
+        return "NOT_ELIGIBLE"
+    
+    if any(word in q for word in ["eligible", "eligibility"]):
+        return "ELIGIBLE"
+    
+    # BATCH queries (check early)
+    if any(word in q for word in ["no batch", "without batch", "batch nahi"]):
+        return "NO_BATCH"
+    
+    if any(word in q for word in ["with batch", "batch assigned", "batch mila", "have batch"]):
+        return "WITH_BATCH"
+    
+    # ADMISSION CANCELLED queries (check first - most specific)
+    if any(word in q for word in ["cancelled", "cancel"]) and any(word in q for word in ["admission", "admitted"]):
+        return "ADMISSION_CANCELLED"
+    
+    # ADMISSION queries (check before registration)
+    if any(word in q for word in ["admission", "admitted"]):
+        return "ADMISSION"
+    
+    # REGISTRATION queries
+    if any(word in q for word in ["registration", "registered", "total", "student", "count", "how many", "kitne"]):
+        return "REGISTRATION"
+    
+    return "UNKNOWN"
+
+
+def make_questions(count, seed=0):
+    """Questions built from the bot's keywords plus filler words and numbers"""
+    rng = random.Random(seed)
+    keywords = [word for words in INTENT_KEYWORDS.values() for word in words]
+    filler = ["students", "ka", "kitna", "hai", "the", "who", "got", "please", "show", "me", "batch", "rs"]
+    questions = []
+    for _ in range(count):
+        words = rng.sample(keywords, rng.randint(1, 3)) + rng.sample(filler, rng.randint(0, 4))
+        words += [str(rng.randint(0, 20000)) for _ in range(rng.randint(0, 2))]
+        rng.shuffle(words)
+        questions.append(" ".join(words))
+    return questions
+
+
+def legacy_parse(question):
+    """Intent plus numbers the way answer() used to get them"""
+    return legacy_detect_intent(question), tuple(int(n) for n in re.findall(r'\d+', question))
+
+
+def compiled_parse(question):
+    """The compiled matcher without the LRU cache"""
+    return match_question.__wrapped__(question.lower().strip())
+
+
+def cached_parse(question):
+    """The compiled matcher as StudentQueryBot.parse_question calls it"""
+    return match_question(question.lower().strip())
+
+
+def main():
+    questions = make_questions(5000)
+    
+    mismatches = [q for q in questions if legacy_parse(q) != compiled_parse(q)]
+    if mismatches:
+        print(f"MISMATCH on {len(mismatches)} questions, e.g. {mismatches[:3]}")
+        sys.exit(1)
+    print(f"Same intent and numbers for all {len(questions)} questions")
+    
+    # Bulk traffic repeats a small set of phrasings
+    rng = random.Random(1)
+    repeated = [rng.choice(questions[:200]) for _ in range(5000)]
+    
+    for label, workload in [("unique questions", questions), ("repeated questions", repeated)]:
+        print(f"\n{label}:")
+        for name, parse in [
+            ("original scans", legacy_parse),
+            ("compiled regex", compiled_parse),
+            ("compiled + LRU cache", cached_parse),
+        ]:
+            match_question.cache_clear()
+            seconds = min(timeit.repeat(lambda: [parse(q) for q in workload], number=5, repeat=3)) / 5
+            print(f"  {name:22s} {seconds / len(workload) * 1e6:8.2f} us/question")
+
+
+if __name__ == "__main__":
+    main()
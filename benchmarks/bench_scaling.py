@@ -0,0 +1,123 @@
+"""Scaling benchmark: combined questions over row partitions on 1 to N workers
+
+Run from the repo root:
+
+    python benchmarks/bench_scaling.py                    # 1m rows, 1 worker up to one per core
+    python benchmarks/bench_scaling.py --sizes 10m --workers 1 2 4 8 16
+
+Each question is timed in-process (the serial path of get_compound) and on
+a PartitionPool of every worker count, after checking that all of them
+give the same answer. Results are written to benchmarks/scaling.json.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_suite import environment, format_seconds, make_bot, timed
+from index import PartitionPool, SharedColumns
+from make_data import ensure_csv, parse_size, size_label
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCALING_PATH = os.path.join(BENCH_DIR, "scaling.json")
+
+# Questions whose rows are scanned: combined conditions, plus single range
+# and count conditions run through the same plan
+QUESTIONS = [
+    "admitted students with batch who paid more than 5000 and discount below 20",
+    "eligible students with fees between 4000 and 9000",
+    "fees more than 5000 and discount less than 30",
+    "registered students without batch who paid less than 3000 and discount more than 5",
+    "fees more than 3499",
+    "not eligible students",
+]
+
+
+def default_workers():
+    """1, 2, 4, ... up to the number of cores (always including it)"""
+    cpus = os.cpu_count() or 1
+    workers = [1]
+    while workers[-1] * 2 < cpus:
+        workers.append(workers[-1] * 2)
+    if cpus > 1:
+        workers.append(cpus)
+    return workers
+
+
+def question_plans(bot):
+    """(question, plan) for every question"""
+    return [(question, bot.rows_plan(question)) for question in QUESTIONS]
+
+
+def same_result(a, b):
+    """Counts equal, totals and means equal up to rounding"""
+    if a['count'] != b['count'] or abs(a['total'] - b['total']) > 1e-6 * max(1.0, abs(a['total'])):
+        return False
+    if a['avg_discount'] != a['avg_discount']:
+        return b['avg_discount'] != b['avg_discount']
+    return abs(a['avg_discount'] - b['avg_discount']) <= 1e-9 * max(1.0, abs(a['avg_discount']))
+
+
+def bench_size(rows, worker_counts):
+    """Seconds per question, serial and per worker count, for one data size"""
+    path = ensure_csv(rows)
+    bot = make_bot(path, snapshot=False, cache_size=0)
+    plans = question_plans(bot)
+    shared = SharedColumns(bot.df, bot.bitmap_index)
+
+    results = {}
+    expected = {}
+    for question, plan in plans:
+        expected[question] = bot.get_compound(plan)
+        results[f"serial/{question}"] = timed(lambda: bot.get_compound(plan))
+
+    for workers in worker_counts:
+        pool = PartitionPool(workers)
+        try:
+            for question, plan in plans:
+                result = pool.evaluate(shared, plan.predicates, plan.ranges)
+                if not same_result(result, expected[question]):
+                    print(f"  {workers} workers: {question!r} gave {result}, expected {expected[question]}")
+                    sys.exit(1)
+                results[f"workers={workers}/{question}"] = timed(lambda: pool.evaluate(shared, plan.predicates, plan.ranges))
+        finally:
+            pool.close()
+    return results
+
+
+def print_table(label, results, worker_counts):
+    """Seconds per question and speedup over one worker"""
+    print(f"\n{label} rows")
+    header = f"  {'question':60s} {'serial':>12s}" + "".join(f" {f'{w} workers':>16s}" for w in worker_counts)
+    print(header)
+    for question in QUESTIONS:
+        one = results[f"workers={worker_counts[0]}/{question}"]
+        line = f"  {question[:60]:60s} {format_seconds(results[f'serial/{question}']):>12s}"
+        for workers in worker_counts:
+            seconds = results[f"workers={workers}/{question}"]
+            line += f" {format_seconds(seconds):>10s} {one / seconds:4.1f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time combined questions on 1 to N partition workers")
+    parser.add_argument("--sizes", nargs="+", default=["1m"], help="row counts such as 1m, 10m")
+    parser.add_argument("--workers", nargs="+", type=int, default=default_workers(), help="worker counts to time")
+    parser.add_argument("--output", default=SCALING_PATH, help="where to write the results JSON")
+    args = parser.parse_args()
+
+    report = {"environment": environment(), "workers": args.workers, "results": {}}
+    for rows in map(parse_size, args.sizes):
+        label = size_label(rows)
+        report["results"][label] = bench_size(rows, args.workers)
+        print_table(label, report["results"][label], args.workers)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
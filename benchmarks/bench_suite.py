@@ -0,0 +1,254 @@
+"""Benchmark suite: CSV load, intent detection, every get_* method and answer()
+
+Run from the repo root:
+
+    python benchmarks/bench_suite.py                      # 10k, 100k, 1m rows
+    python benchmarks/bench_suite.py --sizes 10k 10m
+    python benchmarks/bench_suite.py --save-baseline      # store these numbers as the baseline
+
+Synthetic CSVs are generated on first use (see make_data.py). Results are
+written to benchmarks/results.json and compared with
+benchmarks/baseline.json; any timing more than --tolerance slower than
+the baseline is flagged, and the exit status is 1 when there are
+regressions.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from index import StudentQueryBot, match_question
+from make_data import ensure_csv, parse_size, size_label
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = os.path.join(BENCH_DIR, "results.json")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+# Differences smaller than this are timer noise, whatever the ratio
+NOISE_SECONDS = 2e-6
+
+# One English and one Hinglish phrasing per intent
+QUESTIONS = {
+    "REGISTRATION": ["how many registered students", "total students kitne hain"],
+    "ADMISSION": ["how many admission students", "admitted students kitne hain"],
+    "ADMISSION_CANCELLED": ["admission cancelled students", "kitne admission cancel hue"],
+    "NO_BATCH": ["students without batch", "kitne students ko batch nahi mila"],
+    "WITH_BATCH": ["students with batch", "kitne students ko batch mila"],
+    "ELIGIBLE": ["how many eligible students", "eligibility wale students kitne"],
+    "NOT_ELIGIBLE": ["how many not eligible students", "kitne students eligible nahi hain"],
+    "FEES_MORE_THAN": ["fees more than 5000", "5000 se zyada fees kitne ne paid kiya"],
+    "FEES_LESS_THAN": ["fees less than 3000", "3000 se kam fees payment"],
+    "FEES_BETWEEN": ["fees between 5000 and 10000", "fees 4000 aur 12000 between"],
+    "DISCOUNT_MORE_THAN": ["discount more than 50", "50 se jyada chhoot"],
+    "DISCOUNT_LESS_THAN": ["discount less than 30", "30 se niche concession"],
+    "DISCOUNT_BETWEEN": ["discount between 20 and 60", "chhoot 10 aur 40 between"],
+}
+
+# get_* methods and the arguments they are timed with
+GET_METHODS = [
+    ("get_registration_students", ()),
+    ("get_admission_students", ()),
+    ("get_admission_cancelled_students", ()),
+    ("get_no_batch_students", ()),
+    ("get_with_batch_students", ()),
+    ("get_eligible_students", ()),
+    ("get_not_eligible_students", ()),
+    ("get_fees_more_than", (5000,)),
+    ("get_fees_less_than", (3000,)),
+    ("get_fees_between", (5000, 10000)),
+    ("get_discount_more_than", (50,)),
+    ("get_discount_less_than", (30,)),
+    ("get_discount_between", (20, 60)),
+]
+
+
+def best_time(func, number, repeat=3):
+    """Fastest of `repeat` runs, in seconds per call"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def calls_for(seconds):
+    """How many calls fit in ~0.2s, given the time of one call"""
+    return max(1, min(10000, int(0.2 / max(seconds, 1e-7))))
+
+
+def timed(func):
+    """Time func with enough calls per repeat for a stable figure"""
+    start = time.perf_counter()
+    func()
+    return best_time(func, calls_for(time.perf_counter() - start))
+
+
+def check_questions():
+    """Every benchmark question must be detected as the intent it is listed under"""
+    wrong = [(question, intent, match_question(question)[0])
+             for intent, questions in QUESTIONS.items() for question in questions
+             if match_question(question)[0] != intent]
+    for question, expected, found in wrong:
+        print(f"  question {question!r} detected as {found}, expected {expected}")
+    if wrong:
+        sys.exit(1)
+
+
+def make_bot(path, **kwargs):
+    """A bot without voice, with its load messages swallowed"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return StudentQueryBot(path, voice=False, intent_model=None, **kwargs)
+
+
+def bench_load(path):
+    """Seconds to load a CSV: plain parse, first start (writes the snapshot), warm start
+    Also returns a bot without a result cache and one with the default cache.
+    """
+    results = {}
+    snapshot_dir = path + ".snapshot"
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+    start = time.perf_counter()
+    make_bot(path, snapshot=False, cache_size=0)
+    results["load/csv"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bot = make_bot(path, cache_size=0)
+    results["load/csv+snapshot_write"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cached_bot = make_bot(path)
+    results["load/snapshot"] = time.perf_counter() - start
+
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    return results, bot, cached_bot
+
+
+def bench_intents():
+    """Per-question intent detection, uncached and cached"""
+    questions = [question for phrasings in QUESTIONS.values() for question in phrasings]
+    uncached = match_question.__wrapped__
+    return {
+        "intent/uncached": timed(lambda: [uncached(q) for q in questions]) / len(questions),
+        "intent/cached": timed(lambda: [match_question(q) for q in questions]) / len(questions),
+    }
+
+
+def bench_queries(bot, cached_bot):
+    """Each get_* method on its own, then answer() for every question:
+    computed every time on bot (no result cache), and as cache hits on
+    cached_bot
+    """
+    results = {}
+    for name, args in GET_METHODS:
+        method = getattr(bot, name)
+        result = method(*args)
+        if isinstance(result, str):
+            print(f"  {name}{args} returned an error: {result}")
+        results[f"get/{name}"] = timed(lambda: method(*args))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for intent, questions in QUESTIONS.items():
+            results[f"answer/{intent}"] = timed(lambda: [bot.answer(q) for q in questions]) / len(questions)
+            results[f"answer_cached/{intent}"] = timed(lambda: [cached_bot.answer(q) for q in questions]) / len(questions)
+    return results
+
+
+def run_suite(sizes):
+    """Benchmark each size; returns {size label: {metric: seconds}}"""
+    check_questions()
+    results = {}
+    for rows in sizes:
+        label = size_label(rows)
+        path = ensure_csv(rows)
+        print(f"\n{label} rows ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+        size_results, bot, cached_bot = bench_load(path)
+        size_results.update(bench_intents())
+        size_results.update(bench_queries(bot, cached_bot))
+        for metric, seconds in size_results.items():
+            print(f"  {metric:42s} {format_seconds(seconds)}")
+        results[label] = size_results
+    return results
+
+
+def format_seconds(seconds):
+    """Seconds in the most readable unit"""
+    if seconds >= 1:
+        return f"{seconds:9.3f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:9.3f} ms"
+    return f"{seconds * 1e6:9.3f} us"
+
+
+def environment():
+    """What the numbers were measured on"""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Metrics more than `tolerance` (a fraction) slower than the baseline"""
+    regressions = []
+    for label, metrics in results.items():
+        for metric, seconds in metrics.items():
+            base = baseline.get("results", {}).get(label, {}).get(metric)
+            if base and seconds > base * (1 + tolerance) and seconds - base > NOISE_SECONDS:
+                regressions.append((label, metric, base, seconds))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loading and answering on synthetic data")
+    parser.add_argument("--sizes", nargs="+", default=["10k", "100k", "1m"],
+                        help="row counts such as 10k, 100k, 1m, 10m")
+    parser.add_argument("--output", default=RESULTS_PATH, help="where to write the results JSON")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="flag timings this much slower than the baseline (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="also store the results as the baseline")
+    args = parser.parse_args()
+
+    report = {"environment": environment(), "results": run_suite([parse_size(size) for size in args.sizes])}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(report["results"], baseline, args.tolerance)
+    if not regressions:
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+        return
+
+    print(f"\nREGRESSIONS against {args.baseline} (tolerance {args.tolerance:.0%}):")
+    for label, metric, base, seconds in regressions:
+        print(f"  {label:5s} {metric:42s} {format_seconds(base)} -> {format_seconds(seconds)} ({seconds / base:.2f}x)")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Parity check: streamed answers must match the in-memory ones exactly
+
+Run from the repo root:
+
+    python benchmarks/check_parity.py                     # 10k rows
+    python benchmarks/check_parity.py --sizes 100k --chunksize 7777
+
+Every benchmark question (one English and one Hinglish phrasing per intent)
+is answered with the data loaded in memory and streamed in chunks, on the
+generated file and on copies with one value that doesn't fit its column
+in the middle. The exit status is 1 when any answer differs.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+from bench_suite import QUESTIONS, make_bot
+from make_data import ensure_csv, parse_size, size_label
+
+# Copies of the data with one bad value: (label, column, value)
+BAD_VALUES = [
+    ("bad free_admission", 'free_admission', "maybe"),
+    ("bad fees_paid", 'fees_paid', "n/a"),
+]
+
+
+def with_bad_value(path, directory, column, value):
+    """A copy of the CSV with value in column, halfway down"""
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    df.loc[len(df) // 2, column] = value
+    copy = os.path.join(directory, f"{column}_{os.path.basename(path)}")
+    df.to_csv(copy, index=False)
+    return copy
+
+
+def display(response):
+    """The display text of an answer"""
+    return response['display'] if isinstance(response, dict) else response
+
+
+def check_file(label, path, chunksize):
+    """Answer every question both ways; returns the number of differences"""
+    loaded = make_bot(path, snapshot=False, cache_size=0)
+    streamed = make_bot(path, streaming=True, chunksize=chunksize, cache_size=0)
+    differences = 0
+    for intent, questions in QUESTIONS.items():
+        for question in questions:
+            expected, found = display(loaded.answer(question)), display(streamed.answer(question))
+            if expected != found:
+                differences += 1
+                print(f"  {label}: {question!r} ({intent})\n    in memory: {expected!r}\n    streamed:  {found!r}")
+    print(f"{label}: {'OK' if not differences else f'{differences} differences'}")
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that streamed answers match in-memory answers")
+    parser.add_argument("--sizes", nargs="+", default=["10k"], help="row counts such as 10k, 100k")
+    parser.add_argument("--chunksize", type=int, default=777, help="rows per chunk when streaming")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    differences = 0
+    try:
+        for rows in map(parse_size, args.sizes):
+            path = ensure_csv(rows)
+            differences += check_file(size_label(rows), path, args.chunksize)
+            for label, column, value in BAD_VALUES:
+                copy = with_bad_value(path, directory, column, value)
+                differences += check_file(f"{size_label(rows)}, {label}", copy, args.chunksize)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if differences:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
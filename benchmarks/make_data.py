@@ -0,0 +1,141 @@
+"""Generate synthetic AY26-shaped CSV exports for benchmarking
+
+Run from the repo root:
+
+    python benchmarks/make_data.py 10k 100k 1m 10m
+
+Files are written to benchmarks/data/AY26_<size>.csv. The same size and
+seed always give the same file.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Rows written per pandas frame, so 10M rows never sit in memory at once
+CHUNK_ROWS = 500000
+
+# Value -> share of rows, roughly as they appear in real exports
+STATUS = {'Active': 0.72, 'Inactive': 0.18, 'Dropped': 0.08, None: 0.02}
+ENROLLMENT = {
+    'Admission Done': 0.30, 'admission pending': 0.08, 'ADMISSION CONFIRMED': 0.04,
+    'Registered': 0.35, 'Enquiry': 0.15, None: 0.08,
+}
+FORM_STATUS = {
+    'Submitted': 0.55, 'Draft': 0.20, 'Admission Cancelled': 0.05,
+    'Admission Cancel': 0.02, 'Rejected': 0.03, None: 0.15,
+}
+BATCH = {
+    'No Batch': 0.20, 'Batch A': 0.15, 'Batch B': 0.15, 'Morning 1': 0.10,
+    'Evening 2': 0.10, 'Weekend': 0.05, None: 0.25,
+}
+ELIGIBILITY = {'Eligible': 0.60, 'Not Eligible': 0.25, 'Pending Review': 0.05, None: 0.10}
+FREE_ADMISSION = {False: 0.88, True: 0.09, None: 0.03}
+CITIES = ['Patna', 'Delhi', 'Kota', 'Lucknow', 'Jaipur', 'Ranchi', 'Indore', 'Pune']
+
+
+def parse_size(text):
+    """'10k' -> 10000, '1m' -> 1000000, '2500' -> 2500"""
+    text = text.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    digits = text[:-1] if multiplier > 1 else text
+    return int(float(digits) * multiplier)
+
+
+def size_label(rows):
+    """1000000 -> '1m', 10000 -> '10k'"""
+    if rows % 1000000 == 0:
+        return f"{rows // 1000000}m"
+    if rows % 1000 == 0:
+        return f"{rows // 1000}k"
+    return str(rows)
+
+
+def data_path(rows):
+    """Where the generated file for a size lives"""
+    return os.path.join(DATA_DIR, f"AY26_{size_label(rows)}.csv")
+
+
+def choose(rng, shares, n):
+    """Draw n values from a {value: share} table"""
+    values = list(shares)
+    p = np.array(list(shares.values()), dtype=float)
+    picks = rng.choice(len(values), size=n, p=p / p.sum())
+    return np.array(values, dtype=object)[picks]
+
+
+def make_chunk(rng, start, n):
+    """One frame of synthetic students, ids start..start+n"""
+    ids = np.arange(start, start + n)
+
+    # Most students pay a registration fee; a few pay the full course fee
+    fees = rng.choice([0, 1000, 3499, 3500, 5000, 12000, 45000], size=n, p=[0.10, 0.05, 0.05, 0.35, 0.20, 0.15, 0.10])
+    fees = fees + rng.integers(0, 500, size=n) * (fees > 3500)
+    fees = fees.astype(float)
+    fees[rng.random(n) < 0.02] = np.nan
+
+    discount = np.round(rng.beta(1.2, 6.0, size=n) * 100, 1)
+    discount[rng.random(n) < 0.30] = np.nan
+
+    return pd.DataFrame({
+        'student_id': ids,
+        'student_name': np.char.add('Student ', ids.astype(str)),
+        'phone': 9000000000 + rng.integers(0, 999999999, size=n),
+        'city': np.array(CITIES, dtype=object)[rng.integers(0, len(CITIES), size=n)],
+        'fees_paid': fees,
+        'status': choose(rng, STATUS, n),
+        'free_admission': choose(rng, FREE_ADMISSION, n),
+        'ay26_enrollment_status': choose(rng, ENROLLMENT, n),
+        'form_status': choose(rng, FORM_STATUS, n),
+        'batch': choose(rng, BATCH, n),
+        'eligibility_status': choose(rng, ELIGIBILITY, n),
+        '% discount': discount,
+        'remarks': choose(rng, {'': 0.7, 'Follow up': 0.2, 'Called twice, no answer': 0.1}, n),
+    })
+
+
+def generate_csv(path, rows, seed=0):
+    """Write a synthetic export with the given number of rows"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", newline="") as f:
+        for start in range(0, rows, CHUNK_ROWS):
+            chunk = make_chunk(rng, start, min(CHUNK_ROWS, rows - start))
+            chunk.to_csv(f, index=False, header=(start == 0))
+    os.replace(temp_path, path)
+    return path
+
+
+def ensure_csv(rows, seed=0):
+    """Path of the generated file for a size, generating it if missing"""
+    path = data_path(rows)
+    if not os.path.exists(path):
+        print(f"Generating {size_label(rows)} rows -> {path}")
+        generate_csv(path, rows, seed)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic AY26-shaped CSV exports")
+    parser.add_argument("sizes", nargs="*", default=["10k", "100k", "1m"],
+                        help="row counts such as 10k, 100k, 1m, 10m")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--force", action="store_true", help="regenerate files that already exist")
+    args = parser.parse_args()
+
+    for rows in map(parse_size, args.sizes):
+        path = data_path(rows)
+        if args.force or not os.path.exists(path):
+            print(f"Generating {size_label(rows)} rows -> {path}")
+            generate_csv(path, rows, args.seed)
+        else:
+            print(f"Exists: {path}")
+
+
+if __name__ == "__main__":
+    main()
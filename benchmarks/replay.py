@@ -0,0 +1,159 @@
+"""Replay a captured query log against any data snapshot
+
+Run from the repo root:
+
+    python index.py Ay26.csv --query-log queries.jsonl         # capture
+    python benchmarks/replay.py queries.jsonl Ay26.csv         # replay as fast as possible
+    python benchmarks/replay.py queries.jsonl Ay26.csv --concurrency 8 --rate 200
+    python benchmarks/replay.py queries.jsonl --url http://127.0.0.1:8080   # against --serve
+
+Questions are sent through answer() (or POST /answer with --url) from
+--concurrency threads. Without --rate each thread starts the next
+question as soon as the last one is answered. With --rate they are
+started on a fixed schedule of that many per second, and latency is
+measured from the scheduled start, so time spent queued behind slow
+answers is counted too. The
+report gives throughput and latency percentiles overall and per intent;
+--output also writes it as JSON.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from bench_suite import environment, format_seconds, make_bot
+from index import match_question, read_query_log
+
+PERCENTILES = (50, 95, 99)
+
+
+def http_answer(url):
+    """answer(question) that asks a running --serve server"""
+    endpoint = url.rstrip("/") + "/answer"
+
+    def answer(question):
+        request = urllib.request.Request(endpoint, data=json.dumps({"question": question}).encode(),
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request) as response:
+            return json.load(response)
+    return answer
+
+
+def replay(records, answer, concurrency, rate):
+    """Send every record's question through answer()
+    Returns (elapsed seconds, [(intent, latency seconds, error or None)]).
+    """
+    results = []
+    lock = threading.Lock()
+
+    def run(record, scheduled):
+        # Without a rate the questions are queued all at once: time each from its start
+        scheduled = scheduled or time.perf_counter()
+        error = None
+        try:
+            answer(record['question'])
+        except Exception as e:
+            error = str(e)
+        latency = time.perf_counter() - scheduled
+        with lock:
+            results.append((record.get('intent', "UNKNOWN"), latency, error))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i, record in enumerate(records):
+            scheduled = start + i / rate if rate else None
+            if scheduled is not None and scheduled > time.perf_counter():
+                time.sleep(scheduled - time.perf_counter())
+            pool.submit(run, record, scheduled)
+    return time.perf_counter() - start, results
+
+
+def latency_summary(latencies):
+    """Calls, p50/p95/p99 and max of a list of seconds"""
+    values = np.array(latencies)
+    summary = {'calls': len(values), 'max': float(values.max())}
+    for p in PERCENTILES:
+        summary[f'p{p}'] = float(np.percentile(values, p))
+    return summary
+
+
+def build_report(elapsed, results, concurrency, rate):
+    """Throughput and latency percentiles, overall and per intent"""
+    by_intent = {}
+    for intent, latency, error in results:
+        by_intent.setdefault(intent, []).append(latency)
+    return {
+        'environment': environment(),
+        'concurrency': concurrency,
+        'rate': rate,
+        'questions': len(results),
+        'errors': sum(1 for intent, latency, error in results if error),
+        'seconds': elapsed,
+        'throughput': len(results) / elapsed if elapsed else 0.0,
+        'overall': latency_summary([latency for intent, latency, error in results]),
+        'intents': {intent: latency_summary(latencies) for intent, latencies in sorted(by_intent.items())},
+    }
+
+
+def print_report(report):
+    """The report as a table"""
+    print(f"\n{report['questions']} questions in {report['seconds']:.2f}s: "
+          f"{report['throughput']:.1f} answers/s, {report['errors']} errors "
+          f"(concurrency {report['concurrency']}, rate {report['rate'] or 'unlimited'})")
+    print(f"  {'intent':32s} {'calls':>7s}" + "".join(f" {f'p{p}':>12s}" for p in PERCENTILES) + f" {'max':>12s}")
+    rows = [("ALL", report['overall'])] + list(report['intents'].items())
+    for intent, summary in rows:
+        line = f"  {intent[:32]:32s} {summary['calls']:7d}"
+        line += "".join(f" {format_seconds(summary[f'p{p}']):>12s}" for p in PERCENTILES)
+        print(line + f" {format_seconds(summary['max']):>12s}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a query log and report throughput and latency")
+    parser.add_argument("log", help="query log written with --query-log (or a --questions JSONL file)")
+    parser.add_argument("csv_path", nargs="?", help="data to answer from (not needed with --url)")
+    parser.add_argument("--url", help="replay against a running 'index.py --serve' server instead")
+    parser.add_argument("--concurrency", type=int, default=1, help="questions in flight at once")
+    parser.add_argument("--rate", type=float, default=0, help="questions started per second (0 = as fast as possible)")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the log this many times")
+    parser.add_argument("--cache-size", type=int, default=256, help="result cache size for the in-process bot")
+    parser.add_argument("--output", metavar="JSON", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    records = read_query_log(args.log) * args.repeat
+    if not records:
+        print(f"No questions in {args.log}")
+        sys.exit(1)
+
+    if args.url:
+        answer = http_answer(args.url)
+    elif args.csv_path:
+        answer = make_bot(args.csv_path, cache_size=args.cache_size).answer
+    else:
+        parser.error("give a csv_path or --url")
+
+    # Records without an intent (plain questions files) are grouped by the keyword rules' intent
+    for record in records:
+        if 'intent' not in record:
+            record['intent'] = match_question(record['question'].lower())[0]
+
+    elapsed, results = replay(records, answer, args.concurrency, args.rate)
+    report = build_report(elapsed, results, args.concurrency, args.rate)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,2422 @@
+import time
+_IMPORT_START = time.perf_counter()
+
+import numpy as np
 import pandas as pd
-import pyttsx3
+from pandas.api.types import union_categoricals
+import atexit
+import collections
+import copy
+import functools
+import hashlib
+import io
+import json
+import math
 import os
+import re
+import shutil
 import sys
+import threading
+import glob
+import weakref
+
+# pyttsx3, and the modules only some features use (server, profiling,
+# partitions, audio clips), are imported when first needed
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
+
+# Exports for other academic years name the enrollment column after the year
+ENROLLMENT_COLUMN = 'ay26_enrollment_status'
+ENROLLMENT_PATTERN = re.compile(r'ay\d{2}_enrollment_status')
+
+# Columns the bot queries and the dtype each one is parsed as
+CSV_DTYPES = {
+    'fees_paid': 'float64',
+    'status': 'category',
+    'free_admission': 'boolean',
+    'ay26_enrollment_status': 'category',
+    'form_status': 'category',
+    'batch': 'category',
+    'eligibility_status': 'category',
+    '% discount': 'float64',
+}
+
+# Keyword groups used by intent detection (English + Hinglish)
+INTENT_KEYWORDS = {
+    'more': ["more than", "greater than", "above", "zyada", "jyada"],
+    'less': ["less than", "below", "under", "kam", "niche"],
+    'between': ["between"],
+    'discount': ["discount", "concession", "chhoot"],
+    'fees': ["paid", "fees", "fee", "payment"],
+    'not_eligible': ["not eligible", "ineligible", "eligible nahi"],
+    'eligible': ["eligible", "eligibility"],
+    'no_batch': ["no batch", "without batch", "batch nahi"],
+    'with_batch': ["with batch", "batch assigned", "batch mila", "have batch"],
+    'cancelled': ["cancelled", "cancel"],
+    'admission': ["admission", "admitted"],
+    'registration': ["registration", "registered", "total", "student", "count", "how many", "kitne"],
+}
+
+# Intents in priority order, each with the keyword groups it needs
+INTENT_RULES = [
+    # DISCOUNT queries with numeric conditions (check very early)
+    ("DISCOUNT_MORE_THAN", ('more', 'discount')),
+    ("DISCOUNT_LESS_THAN", ('less', 'discount')),
+    ("DISCOUNT_BETWEEN", ('between', 'discount')),
+    ("FEES_MORE_THAN", ('more', 'fees')),
+    ("FEES_LESS_THAN", ('less', 'fees')),
+    ("FEES_BETWEEN", ('between', 'fees')),
+    # ELIGIBLE queries (check early - specific)
+    ("NOT_ELIGIBLE", ('not_eligible',)),
+    ("ELIGIBLE", ('eligible',)),
+    # BATCH queries (check early)
+    ("NO_BATCH", ('no_batch',)),
+    ("WITH_BATCH", ('with_batch',)),
+    # ADMISSION CANCELLED before ADMISSION, ADMISSION before REGISTRATION
+    ("ADMISSION_CANCELLED", ('cancelled', 'admission')),
+    ("ADMISSION", ('admission',)),
+    ("REGISTRATION", ('registration',)),
+]
+
+
+def keyword_trie_pattern(words):
+    """Regex alternation for words, nested as a prefix trie
+    Shared prefixes are matched once, which keeps the per-position cost low.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    def emit(node):
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if '' in node:
+            # A word ends here; prefer the longer words (greedy)
+            return '(?:' + '|'.join(branches) + ')?'
+        if len(branches) == 1:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')'
+    
+    return emit(trie)
+
+
+def build_question_matcher():
+    """Compile one regex that finds every keyword and number in a single pass
+    Keywords are matched in a zero-width lookahead, so overlapping keywords
+    are all found ("not eligible" also contains "eligible"). At one position
+    only the longest keyword matches, so the shorter keywords it starts with
+    are added from a lookup table.
+    """
+    keywords = sorted({word for words in INTENT_KEYWORDS.values() for word in words})
+    pattern = re.compile(r'(\d+)|(?=(' + keyword_trie_pattern(keywords) + '))')
+    
+    groups_for = {
+        word: {group for group, words in INTENT_KEYWORDS.items() for other in words if word.startswith(other)}
+        for word in keywords
+    }
+    return pattern, groups_for
+
+
+QUESTION_PATTERN, KEYWORD_GROUPS = build_question_matcher()
+
+
+@functools.lru_cache(maxsize=4096)
+def match_question(text):
+    """Intent and numbers in a question, found in one pass
+    text should already be lower-cased and stripped. Returns (intent, numbers)
+    where numbers are the integers in the text in order.
+    """
+    groups = set()
+    numbers = []
+    for match in QUESTION_PATTERN.finditer(text):
+        if match.group(1):
+            numbers.append(int(match.group(1)))
+        else:
+            groups |= KEYWORD_GROUPS[match.group(2)]
+    
+    for intent, required in INTENT_RULES:
+        if groups.issuperset(required):
+            return intent, tuple(numbers)
+    return "UNKNOWN", tuple(numbers)
+
+
+# intent_model.pkl classes that correspond to an intent the bot can answer
+MODEL_INTENT_MAP = {
+    'REGISTRATION': "REGISTRATION",
+    'ADMISSION_STATUS': "ADMISSION",
+    'AY26_ENROLLMENT': "ADMISSION",
+    'ELIGIBLE': "ELIGIBLE",
+    'BATCH_ASSIGNED': "WITH_BATCH",
+    'BATCH_ALLOTTED': "WITH_BATCH",
+}
+
+# Bump when the snapshot layout or CSV_DTYPES changes
+SNAPSHOT_VERSION = 1
+
+# Base predicates kept as packed bitsets: name -> (column, row test)
+BITMAP_PREDICATES = {
+    'fees_registered': ('fees_paid', lambda s: s > 3499),
+    'active': ('status', lambda s: s == 'Active'),
+    'not_free': ('free_admission', lambda s: s == False),
+    'admission': ('ay26_enrollment_status', lambda s: s.str.contains('Admission', case=False, na=False)),
+    'form_admission': ('form_status', lambda s: s.str.contains('Admission', case=False, na=False)),
+    'no_batch': ('batch', lambda s: s.str.contains('No Batch', case=False, na=False)),
+    'with_batch': ('batch', lambda s: ~s.str.contains('No Batch', case=False, na=False) & s.notna() & (s != '')),
+    'eligible': ('eligibility_status', lambda s: s == 'Eligible'),
+    'not_eligible': ('eligibility_status', lambda s: s != 'Eligible'),
+}
+
+REGISTRATION_PREDICATES = ('fees_registered', 'active', 'not_free')
+
+# Count intents: intent -> (answer label, predicates every counted row meets)
+COUNT_INTENTS = {
+    "REGISTRATION": ("Registration Students", REGISTRATION_PREDICATES),
+    "ADMISSION": ("Admission Students", REGISTRATION_PREDICATES + ('admission',)),
+    "ADMISSION_CANCELLED": ("Admission Cancelled Students", ('form_admission',)),
+    "NO_BATCH": ("Students Without Batch", ('no_batch', 'admission')),
+    "WITH_BATCH": ("Students With Batch", ('with_batch', 'admission')),
+    "ELIGIBLE": ("Eligible Students", REGISTRATION_PREDICATES + ('eligible',)),
+    "NOT_ELIGIBLE": ("Not Eligible Students", REGISTRATION_PREDICATES + ('not_eligible',)),
+}
+
+# How many of a question's numbers each intent uses; the rest don't change the answer
+INTENT_ARITY = {
+    "FEES_MORE_THAN": 1, "FEES_LESS_THAN": 1, "FEES_BETWEEN": 2,
+    "DISCOUNT_MORE_THAN": 1, "DISCOUNT_LESS_THAN": 1, "DISCOUNT_BETWEEN": 2,
+}
+
+# Range intents as a condition on a column: intent -> (column, comparison)
+RANGE_INTENTS = {
+    "FEES_MORE_THAN": ('fees_paid', 'more'), "FEES_LESS_THAN": ('fees_paid', 'less'),
+    "FEES_BETWEEN": ('fees_paid', 'between'), "DISCOUNT_MORE_THAN": ('% discount', 'more'),
+    "DISCOUNT_LESS_THAN": ('% discount', 'less'), "DISCOUNT_BETWEEN": ('% discount', 'between'),
+}
+
+# Compound questions: a comparison with its number(s). English puts the number
+# after the comparison ("more than 5000"), Hinglish before it ("5000 se zyada")
+CONDITION_PATTERN = re.compile(
+    r'between\s+(?:rs\.?\s*)?(\d+)\s*%?\s*(?:and|to|aur|-)\s*(?:rs\.?\s*)?(\d+)'
+    r'|(more than|greater than|above|less than|below|under)\s+(?:rs\.?\s*)?(\d+)'
+    r'|(\d+)\s*%?\s*(?:se\s+)?(zyada|jyada|kam|niche)'
+)
+FIELD_PATTERN = re.compile(
+    '(' + '|'.join(INTENT_KEYWORDS['discount']) + ')|(' + '|'.join(INTENT_KEYWORDS['fees']) + ')'
+)
+COMPARISONS = {
+    'more than': 'more', 'greater than': 'more', 'above': 'more', 'zyada': 'more', 'jyada': 'more',
+    'less than': 'less', 'below': 'less', 'under': 'less', 'kam': 'less', 'niche': 'less',
+}
+
+# Low-cardinality columns the summary cube groups by, plus the fees threshold
+CUBE_DIMENSIONS = ('status', 'free_admission', ENROLLMENT_COLUMN, 'form_status', 'batch', 'eligibility_status')
+FEES_THRESHOLD_DIMENSION = 'fees_paid > 3499'
+
+# Predicates evaluated differently on cube cells than on rows
+CUBE_PREDICATES = {
+    'fees_registered': (FEES_THRESHOLD_DIMENSION, lambda s: s == True),
+}
+
+# Words that name a cube dimension in "... per batch" / "status wise ..." questions
+BREAKDOWN_DIMENSIONS = {
+    'form status': 'form_status',
+    'free admission': 'free_admission',
+    'eligibility': 'eligibility_status',
+    'enrollment': ENROLLMENT_COLUMN,
+    'enrolment': ENROLLMENT_COLUMN,
+    'batch': 'batch',
+    'status': 'status',
+}
+_BREAKDOWN_WORDS = '|'.join(sorted(BREAKDOWN_DIMENSIONS, key=len, reverse=True))
+BREAKDOWN_PATTERN = re.compile(
+    r'\b(?:per|by|across)\s+(' + _BREAKDOWN_WORDS + r')(?:es)?\b'
+    r'|\b(' + _BREAKDOWN_WORDS + r')[\s-]?wise\b'
+)
+
+# Numeric columns kept sorted with prefix sums for range questions
+RANGE_COLUMNS = ('fees_paid', '% discount')
+
+# Set bits per byte value, used when np.bitwise_count is not available
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(bits):
+    """Count set bits in a packed bitset"""
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(bits).sum(dtype=np.int64))
+    return int(_POPCOUNT_TABLE[bits].sum(dtype=np.int64))
+
+
+def append_bits(bits, n_bits, new_bits, n_new_bits):
+    """Append one packed bitset to another of n_bits bits"""
+    used = n_bits % 8
+    if used == 0:
+        return np.concatenate((bits, new_bits))
+    
+    # Re-pack the partly used last byte together with the new bits
+    joined = np.concatenate((np.unpackbits(bits[-1:])[:used], np.unpackbits(new_bits)[:n_new_bits]))
+    return np.concatenate((bits[:-1], np.packbits(joined)))
+
+
+# Predicate results per distinct text value: (column, predicate name) -> {value: bool}
+# Missing values are stored under None. Shared by every index and chunk, and
+# started afresh once it holds VALUE_RESULTS_LIMIT values, so high-cardinality
+# columns don't grow it for the life of the process.
+VALUE_RESULTS = collections.defaultdict(dict)
+VALUE_RESULTS_LIMIT = 65536
+
+
+def predicate_mask(column, name, predicate, series):
+    """Boolean array of predicate(series), one entry per row
+    Categorical and text columns are tested once per distinct value and the
+    results spread to rows through the codes; values already tested for
+    this column and predicate are looked up in VALUE_RESULTS instead.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, values = series.cat.codes.to_numpy(), series.cat.categories
+    elif series.dtype == object:
+        codes, values = pd.factorize(series)
+    else:
+        return predicate(series).to_numpy(dtype=bool, na_value=False)
+    
+    results = VALUE_RESULTS[(column, name)]
+    if len(results) > VALUE_RESULTS_LIMIT:
+        # A new dict rather than clear(): other threads may be reading this one
+        results = VALUE_RESULTS[(column, name)] = {}
+    untested = [value for value in values if value not in results]
+    if None not in results:
+        untested.append(None)
+    if untested:
+        tested = predicate(pd.Series(untested, dtype=object)).to_numpy(dtype=bool, na_value=False)
+        results.update(zip(untested, tested))
+    
+    # Code -1 (missing) picks the last entry, the result for a missing value
+    lookup = np.array([results[value] for value in values] + [results[None]], dtype=bool)
+    return lookup[codes]
+
+
+class BitmapIndex:
+    """Packed bitsets (one bit per row) for the base predicates
+    Built once per data load; counts are a bitwise AND plus popcount.
+    """
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.bitsets = {}
+        self.errors = {}
+        
+        for name, (column, predicate) in BITMAP_PREDICATES.items():
+            try:
+                self.bitsets[name] = np.packbits(predicate_mask(column, name, predicate, df[column]))
+            except Exception as e:
+                # Raised again when a question needs this predicate
+                self.errors[name] = e
+    
+    def get(self, name):
+        """Get the packed bitset for a predicate"""
+        if name in self.errors:
+            raise self.errors[name]
+        return self.bitsets[name]
+    
+    def combine(self, *names):
+        """AND the bitsets of the given predicates together"""
+        result = self.get(names[0]).copy()
+        for name in names[1:]:
+            np.bitwise_and(result, self.get(name), out=result)
+        return result
+    
+    def count(self, *names):
+        """Count rows matching all of the given predicates"""
+        return popcount(self.combine(*names))
+    
+    def extended(self, df):
+        """Copy of the index with the rows of df appended"""
+        tail = BitmapIndex(df)
+        index = copy.copy(self)
+        index.n_rows = self.n_rows + tail.n_rows
+        index.errors = {**self.errors, **tail.errors}
+        index.bitsets = {
+            name: append_bits(bits, self.n_rows, tail.bitsets[name], tail.n_rows)
+            for name, bits in self.bitsets.items()
+            if name not in index.errors
+        }
+        return index
+
+
+class SortedRangeIndex:
+    """Sorted copy of a numeric column with prefix sums
+    Range counts and totals come from binary search instead of a filtered copy.
+    """
+    def __init__(self, series):
+        values = series.to_numpy()
+        values = np.sort(values[~pd.isna(values)])
+        
+        self.values = values
+        self.prefix = np.concatenate((np.zeros(1, dtype=values.dtype), np.cumsum(values)))
+    
+    def _range(self, start, end):
+        """Count and total of the sorted values in positions [start, end)"""
+        end = max(start, end)
+        return {
+            'count': int(end - start),
+            'total': self.prefix[end] - self.prefix[start]
+        }
+    
+    def more_than(self, value):
+        """Values strictly greater than value"""
+        return self._range(np.searchsorted(self.values, value, side='right'), len(self.values))
+    
+    def less_than(self, value):
+        """Values strictly less than value"""
+        return self._range(0, np.searchsorted(self.values, value, side='left'))
+    
+    def between(self, low, high):
+        """Values in the closed range [low, high]"""
+        return self._range(
+            np.searchsorted(self.values, low, side='left'),
+            np.searchsorted(self.values, high, side='right')
+        )
+    
+    def extended(self, series):
+        """Copy of the index with the values of series merged in"""
+        new = series.to_numpy()
+        new = np.sort(new[~pd.isna(new)])
+        if len(new) == 0:
+            return self
+        
+        values = self.values.astype(np.result_type(self.values, new), copy=False)
+        positions = np.searchsorted(values, new, side='right')
+        start = positions[0]
+        
+        # Prefix sums before the first inserted value are unchanged
+        index = copy.copy(self)
+        index.values = np.insert(values, positions, new)
+        index.prefix = np.concatenate((self.prefix[:start + 1], self.prefix[start] + np.cumsum(index.values[start:])))
+        return index
+
+
+def object_memory_estimate(series):
+    """Approximate bytes a column would take as a plain Python object column"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy().astype(np.int64) + 1
+        counts = np.bincount(codes, minlength=len(series.cat.categories) + 1)
+        sizes = [sys.getsizeof(float('nan'))] + [sys.getsizeof(value) for value in series.cat.categories]
+        return 8 * len(series) + int(np.dot(counts, sizes))
+    if series.dtype == bool or str(series.dtype) == 'boolean':
+        return 8 * len(series)
+    return int(series.memory_usage(deep=True, index=False))
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-1 of a file's contents"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_state(path):
+    """Size, mtime and SHA-1 identifying the current contents of a file"""
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': file_digest(path)}
+
+
+def read_appended_rows(path, state, chunk_size=1 << 20):
+    """Bytes of the complete lines appended to a file since state was taken
+    Returns (tail bytes, new state); the tail is empty while the only new
+    line is still being written. Returns None when earlier bytes changed.
+    """
+    stat = os.stat(path)
+    if stat.st_size <= state['size'] or state['size'] == 0:
+        return None
+    
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        remaining = state['size']
+        last_byte = b''
+        while remaining:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                return None
+            digest.update(chunk)
+            remaining -= len(chunk)
+            last_byte = chunk[-1:]
+        
+        # A previous last line without a newline may have been extended
+        if digest.hexdigest() != state['sha1'] or last_byte != b'\n':
+            return None
+        tail = f.read(stat.st_size - state['size'])
+    
+    # Leave a partly written last line for the next check
+    tail = tail[:tail.rfind(b'\n') + 1]
+    digest.update(tail)
+    return tail, {'size': state['size'] + len(tail), 'mtime_ns': stat.st_mtime_ns, 'sha1': digest.hexdigest()}
+
+
+def append_frame(df, tail):
+    """Append rows to a frame, keeping categoricals categorical"""
+    columns = {}
+    for name in df.columns:
+        old, new = df[name], tail[name]
+        if isinstance(old.dtype, pd.CategoricalDtype) and isinstance(new.dtype, pd.CategoricalDtype):
+            # An all-blank tail column has float categories; match the frame's
+            categories = new.cat.categories.astype(old.cat.categories.dtype)
+            new = pd.Categorical.from_codes(new.cat.codes, categories=categories)
+            # New categories go last, so existing codes stay valid
+            columns[name] = union_categoricals([old.array, new])
+        else:
+            columns[name] = pd.concat([old, new], ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def categorical_from_codes(codes, categories):
+    """Build a Categorical on top of existing codes without copying them"""
+    try:
+        return pd.Categorical.from_codes(codes, categories=categories, validate=False)
+    except TypeError:
+        # pandas < 2.1 has no validate argument
+        return pd.Categorical.from_codes(codes, categories=categories)
+
+
+class ColumnSnapshot:
+    """On-disk columnar copy of the loaded frame, one .npy file per column
+    Columns are memory-mapped on load, so restarts skip CSV parsing and bots on
+    the same host share one copy through the page cache. The snapshot is keyed
+    by the CSV's size, mtime and SHA-1 and is rebuilt when the CSV changes.
+    """
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self.directory = csv_path + '.snapshot'
+        self.manifest_path = os.path.join(self.directory, 'manifest.json')
+        self.manifest = None
+    
+    def read_manifest(self):
+        """Read the snapshot manifest, or None if there is none"""
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if manifest.get('version') != SNAPSHOT_VERSION:
+            return None
+        return manifest
+    
+    def write_file(self, path, write):
+        """Write a file next to its final path, then move it into place"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    
+    def write_manifest(self, manifest):
+        """Atomically replace the manifest"""
+        self.write_file(self.manifest_path, lambda f: f.write(json.dumps(manifest, indent=1).encode()))
+    
+    def is_current(self, manifest):
+        """Check that the manifest was built from the CSV as it is now"""
+        stat = os.stat(self.csv_path)
+        if manifest['size'] != stat.st_size:
+            return False
+        
+        if manifest['mtime_ns'] != stat.st_mtime_ns:
+            # Touched but maybe not changed: fall back to the content hash
+            if file_digest(self.csv_path) != manifest['sha1']:
+                return False
+            manifest['mtime_ns'] = stat.st_mtime_ns
+            try:
+                self.write_manifest(manifest)
+            except OSError:
+                pass
+        
+        return True
+    
+    def load(self):
+        """Map the snapshot's columns into a DataFrame, or None if stale/missing"""
+        manifest = self.read_manifest()
+        if manifest is None or not self.is_current(manifest):
+            return None
+        self.manifest = manifest
+        
+        columns = {}
+        for meta in manifest['columns']:
+            values = np.load(os.path.join(self.directory, meta['file']), mmap_mode='r')
+            
+            if meta['kind'] == 'category':
+                columns[meta['name']] = categorical_from_codes(values, meta['categories'])
+            elif meta['kind'] == 'boolean':
+                mask = np.load(os.path.join(self.directory, meta['mask_file']), mmap_mode='r')
+                columns[meta['name']] = pd.arrays.BooleanArray(values, mask)
+            else:
+                columns[meta['name']] = values
+        
+        return pd.DataFrame(columns, copy=False)
+    
+    def encode_columns(self, df):
+        """Split columns into plain arrays, or None if a dtype can't be stored"""
+        encoded = []
+        for name in df.columns:
+            column = df[name]
+            meta = {'name': name}
+            arrays = {}
+            
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                categories = list(column.cat.categories)
+                if not all(isinstance(value, str) for value in categories):
+                    return None
+                meta['kind'] = 'category'
+                meta['categories'] = categories
+                arrays['file'] = np.asarray(column.cat.codes)
+            elif str(column.dtype) == 'boolean':
+                meta['kind'] = 'boolean'
+                arrays['file'] = column.to_numpy(dtype=bool, na_value=False)
+                arrays['mask_file'] = column.isna().to_numpy()
+            elif column.dtype.kind in 'biuf':
+                meta['kind'] = 'array'
+                arrays['file'] = column.to_numpy()
+            else:
+                return None
+            
+            encoded.append((meta, arrays))
+        return encoded
+    
+    def save(self, df, state):
+        """Write the frame as a snapshot of the CSV contents described by state"""
+        encoded = self.encode_columns(df)
+        if encoded is None:
+            return False
+        
+        sha1 = state['sha1']
+        os.makedirs(self.directory, exist_ok=True)
+        
+        columns = []
+        for position, (meta, arrays) in enumerate(encoded):
+            for key, values in arrays.items():
+                suffix = '-mask' if key == 'mask_file' else ''
+                meta[key] = f"{sha1[:16]}-{position}{suffix}.npy"
+                self.write_file(os.path.join(self.directory, meta[key]), lambda f: np.save(f, values))
+            columns.append(meta)
+        
+        self.write_manifest({
+            'version': SNAPSHOT_VERSION,
+            'size': state['size'],
+            'mtime_ns': state['mtime_ns'],
+            'sha1': sha1,
+            'columns': columns,
+        })
+        self.remove_stale_files(columns)
+        return True
+    
+    def remove_stale_files(self, columns):
+        """Delete column files from older snapshots (mapped readers keep theirs)"""
+        current = {meta[key] for meta in columns for key in ('file', 'mask_file') if key in meta}
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy') and name not in current:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+class WeightedRangeIndex(SortedRangeIndex):
+    """Range index over distinct values with a row count for each"""
+    def __init__(self, values, counts):
+        order = np.argsort(values, kind='stable')
+        self.values = values[order]
+        counts = counts[order]
+        self.count_prefix = np.concatenate(([0], np.cumsum(counts)))
+        self.prefix = np.concatenate((np.zeros(1, dtype=np.result_type(self.values, counts)), np.cumsum(self.values * counts)))
+    
+    def _range(self, start, end):
+        """Row count and total of the distinct values in positions [start, end)"""
+        end = max(start, end)
+        return {
+            'count': int(self.count_prefix[end] - self.count_prefix[start]),
+            'total': self.prefix[end] - self.prefix[start]
+        }
+
+
+class SummaryCube:
+    """Row counts for every combination of the cube dimensions
+    One cell per distinct combination of CUBE_DIMENSIONS and the
+    fees_paid > 3499 flag, so counts and breakdowns are sums over a few
+    hundred cells instead of scans over the rows. Cubes merge by adding
+    cell counts, so cubes of chunks, appended rows or files combine exactly.
+    """
+    def __init__(self, cells=None):
+        self.cells = cells if cells is not None else pd.DataFrame({'count': pd.Series(dtype='int64')})
+        self.masks = {}
+    
+    @classmethod
+    def from_frame(cls, df):
+        """Count the rows of a frame per cell"""
+        dimensions = {}
+        for column in CUBE_DIMENSIONS:
+            if column in df.columns:
+                dimensions[column] = df[column]
+        if 'fees_paid' in df.columns:
+            dimensions[FEES_THRESHOLD_DIMENSION] = df['fees_paid'] > 3499
+        
+        # Code each dimension (0 = missing) and combine the codes into one key
+        codes, labels = [], []
+        for series in dimensions.values():
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                column_codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+            else:
+                column_codes, uniques = pd.factorize(series)
+            codes.append(column_codes.astype(np.int64) + 1)
+            labels.append(np.array([np.nan] + list(uniques), dtype=object))
+        
+        key = np.zeros(len(df), dtype=np.int64)
+        for column_codes, column_labels in zip(codes, labels):
+            key = key * len(column_labels) + column_codes
+        cell_keys, counts = np.unique(key, return_counts=True)
+        
+        cells = {}
+        for name, column_labels in reversed(list(zip(dimensions, labels))):
+            cells[name] = column_labels[cell_keys % len(column_labels)]
+            cell_keys = cell_keys // len(column_labels)
+        cells = pd.DataFrame({name: cells[name] for name in dimensions})
+        cells['count'] = counts.astype(np.int64)
+        return cls(cells)
+    
+    def merged(self, other):
+        """A new cube with the cells of both cubes added up"""
+        if len(self.cells) == 0:
+            return other
+        if len(other.cells) == 0:
+            return self
+        
+        cells = pd.concat([self.cells, other.cells], ignore_index=True)
+        dimensions = [column for column in cells.columns if column != 'count']
+        cells = cells.groupby(dimensions, dropna=False, sort=False)['count'].sum().reset_index()
+        return SummaryCube(cells)
+    
+    def extended(self, df):
+        """A new cube that also counts the rows of df"""
+        return self.merged(SummaryCube.from_frame(df))
+    
+    def mask(self, name):
+        """Which cells meet a predicate (cached per cube)"""
+        if name not in self.masks:
+            column, predicate = CUBE_PREDICATES.get(name, BITMAP_PREDICATES[name])
+            self.masks[name] = predicate_mask(column, name, predicate, self.cells[column])
+        return self.masks[name]
+    
+    def matching(self, names):
+        """Cells meeting all of the given predicates"""
+        selected = np.ones(len(self.cells), dtype=bool)
+        for name in names:
+            selected &= self.mask(name)
+        return selected
+    
+    def count(self, *names):
+        """Count rows matching all of the given predicates"""
+        return int(self.cells['count'].to_numpy()[self.matching(names)].sum())
+    
+    def breakdown(self, column, *names):
+        """Counts per value of column among rows matching the predicates"""
+        cells = self.cells.loc[self.matching(names), [column, 'count']]
+        counts = cells.groupby(column, dropna=False, sort=False)['count'].sum()
+        return counts[counts > 0].sort_values(ascending=False)
+    
+    def nbytes(self):
+        """Approximate memory held by the cube"""
+        return int(self.cells.memory_usage(deep=True).sum())
+
+
+def predicate_combinations(df, errors):
+    """Id of each row's combination of BITMAP_PREDICATES, one bit per predicate
+    Predicates that can't be evaluated are recorded in errors and left as 0.
+    """
+    combination = np.zeros(len(df), dtype=np.int64)
+    for bit, (name, (column, predicate)) in enumerate(BITMAP_PREDICATES.items()):
+        if name in errors:
+            continue
+        try:
+            mask = predicate_mask(column, name, predicate, df[column])
+        except Exception as e:
+            errors[name] = e
+            continue
+        combination |= mask.astype(np.int64) << bit
+    return combination
+
+
+def combinations_with(names, n_combinations):
+    """Combination ids that include every one of the given predicates"""
+    bits = list(BITMAP_PREDICATES)
+    wanted = sum(1 << bits.index(name) for name in names)
+    combinations = np.arange(n_combinations)
+    return combinations[(combinations & wanted) == wanted]
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with relative accuracy
+    Values go into log-spaced buckets (each relative_accuracy wide either
+    side of its centre); quantiles are within that relative error and
+    sketches merge by adding bucket counts. Values <= 0 share one bucket.
+    """
+    def __init__(self, relative_accuracy=0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = collections.Counter()
+        self.zero_count = 0
+        self.count = 0
+    
+    def update(self, values):
+        """Add an array of values (NaN is skipped)"""
+        values = values[~np.isnan(values)]
+        positive = values[values > 0]
+        self.zero_count += len(values) - len(positive)
+        self.count += len(values)
+        if len(positive):
+            indexes, counts = np.unique(np.ceil(np.log(positive) / self.log_gamma).astype(np.int64), return_counts=True)
+            self.buckets.update(dict(zip(indexes.tolist(), counts.tolist())))
+    
+    def merged(self, other):
+        """A new sketch holding the values of both"""
+        sketch = copy.copy(self)
+        sketch.buckets = self.buckets + other.buckets
+        sketch.zero_count = self.zero_count + other.zero_count
+        sketch.count = self.count + other.count
+        return sketch
+    
+    def quantile(self, q):
+        """Approximate q-quantile (0 <= q <= 1); NaN when empty"""
+        if not self.count:
+            return float('nan')
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class ApproximateSummary:
+    """Stratified sample, quantile sketches and counts for approximate mode
+    Rows are stratified by their combination of BITMAP_PREDICATES, whose
+    exact counts are kept. Each stratum keeps the sample_per_stratum rows
+    with the smallest random keys (a reservoir that merges by keeping the
+    smallest keys of both), holding fees_paid and % discount. Conditions on
+    predicates are therefore exact; range conditions are estimated from
+    the sample with a confidence interval.
+    """
+    SAMPLE_COLUMNS = ('stratum', 'key') + RANGE_COLUMNS
+    
+    # Spawn key of the sample's random streams, so they never repeat the
+    # stream of default_rng(seed) (e.g. data generated with the same seed)
+    SAMPLE_STREAM = 0x5A3D
+    
+    def __init__(self, sample_per_stratum=500, seed=0):
+        self.sample_per_stratum = sample_per_stratum
+        self.seed = seed
+        self.n_rows = 0
+        self.strata_counts = np.zeros(1 << len(BITMAP_PREDICATES), dtype=np.int64)
+        self.sample = {column: np.zeros(0) for column in self.SAMPLE_COLUMNS}
+        self.sample['stratum'] = np.zeros(0, dtype=np.int64)
+        self.sketches = {column: QuantileSketch() for column in RANGE_COLUMNS}
+        self.errors = {}
+        self.range_errors = {}
+    
+    @classmethod
+    def from_frame(cls, df, sample_per_stratum=500, seed=0):
+        """Summary of a whole frame"""
+        summary = cls(sample_per_stratum, seed)
+        summary.update(df)
+        return summary
+    
+    def update(self, df, combination=None):
+        """Add the rows of one chunk (combination: their ids, if known)"""
+        if combination is None:
+            combination = predicate_combinations(df, self.errors)
+        self.strata_counts += np.bincount(combination, minlength=len(self.strata_counts))
+        
+        # A separate random stream per chunk, reproducible for the same data
+        rng = np.random.default_rng(np.random.SeedSequence([self.seed, self.n_rows], spawn_key=(self.SAMPLE_STREAM,)))
+        self.n_rows += len(df)
+        chunk = {'stratum': combination, 'key': rng.random(len(df))}
+        for column in RANGE_COLUMNS:
+            try:
+                values = df[column].to_numpy(dtype=float, na_value=np.nan)
+            except Exception as e:
+                self.range_errors.setdefault(column, e)
+                values = np.full(len(df), np.nan)
+            chunk[column] = values
+            self.sketches[column].update(values)
+        self.sample = self.smallest_keys(self.sample, chunk)
+    
+    def smallest_keys(self, *samples):
+        """Rows of the samples with the smallest keys, per stratum"""
+        rows = {column: np.concatenate([sample[column] for sample in samples]) for column in self.SAMPLE_COLUMNS}
+        order = np.lexsort((rows['key'], rows['stratum']))
+        strata = rows['stratum'][order]
+        starts = np.flatnonzero(np.r_[True, strata[1:] != strata[:-1]])
+        rank = np.arange(len(strata)) - np.repeat(starts, np.diff(np.r_[starts, len(strata)]))
+        keep = order[rank < self.sample_per_stratum]
+        return {column: values[keep] for column, values in rows.items()}
+    
+    def merged(self, other):
+        """A new summary of the rows of both"""
+        summary = copy.copy(self)
+        summary.n_rows = self.n_rows + other.n_rows
+        summary.strata_counts = self.strata_counts + other.strata_counts
+        summary.sample = self.smallest_keys(self.sample, other.sample)
+        summary.sketches = {column: sketch.merged(other.sketches[column]) for column, sketch in self.sketches.items()}
+        summary.errors = {**self.errors, **other.errors}
+        summary.range_errors = {**self.range_errors, **other.range_errors}
+        return summary
+    
+    def extended(self, df):
+        """A new summary that also covers the rows of df"""
+        return self.merged(ApproximateSummary.from_frame(df, self.sample_per_stratum, self.seed + self.n_rows))
+    
+    def sample_rows(self):
+        """Rows in the sample"""
+        return len(self.sample['key'])
+    
+    def estimate(self, plan, z=1.96):
+        """Estimated count, fees total and average discount of a QueryPlan
+        Returns point estimates with z-score confidence half-widths (1.96 is
+        95%), using the stratified estimator with finite population
+        correction. Strata sampled in full contribute no error. Strata
+        where no sampled row matches have no spread to estimate an error
+        from; unmatched_bound is an upper bound on their unsampled matches
+        at the same confidence.
+        """
+        for name in plan.predicates:
+            if name in self.errors:
+                raise self.errors[name]
+        for column, op, bounds in plan.ranges:
+            if column in self.range_errors:
+                raise self.range_errors[column]
+        
+        strata = combinations_with(plan.predicates, len(self.strata_counts))
+        strata = strata[self.strata_counts[strata] > 0]
+        in_strata = np.isin(self.sample['stratum'], strata)
+        match = in_strata.copy()
+        for column, op, bounds in plan.ranges:
+            match &= range_condition_mask(self.sample[column], op, bounds)
+        
+        # Per-stratum sums over the sample, by position of the stratum id in strata
+        position = np.searchsorted(strata, self.sample['stratum'][in_strata])
+        def sums(values):
+            return np.bincount(position, weights=values[in_strata], minlength=len(strata))
+        
+        fees = np.where(match, np.nan_to_num(self.sample['fees_paid']), 0.0)
+        discount = self.sample['% discount']
+        has_discount = match & ~np.isnan(discount)
+        discount = np.where(has_discount, discount, 0.0)
+        
+        N = self.strata_counts[strata].astype(float)
+        n = sums(np.ones(len(match)))
+        sampled = n > 0
+        N, n = N[sampled], n[sampled]
+        weight = N / n
+        correction = np.where(n > 1, (1 - n / N) / np.maximum(n - 1, 1), 0.0)
+        
+        def total_and_error(values):
+            total, squares = sums(values)[sampled], sums(values ** 2)[sampled]
+            variance = N ** 2 * correction * np.maximum(squares - total ** 2 / n, 0.0) / n
+            return float((weight * total).sum()), float(z * np.sqrt(variance.sum()))
+        
+        count, count_error = total_and_error(match.astype(float))
+        
+        # Every sampled row of the unmatched strata misses with probability
+        # prod (1 - p)**n; keeping that above alpha limits sum(n * p) to
+        # about -ln(alpha), so their matches total at most -ln(alpha) * max(N / n)
+        alpha = math.erfc(z / math.sqrt(2))
+        unmatched = (sums(match.astype(float))[sampled] == 0) & (n < N)
+        unmatched_bound = 0.0
+        if unmatched.any():
+            unmatched_bound = min(-math.log(alpha) * (N / n)[unmatched].max(), (N - n)[unmatched].sum())
+        
+        fees_total, fees_error = total_and_error(fees)
+        discount_total, _ = total_and_error(discount)
+        discount_count, _ = total_and_error(has_discount.astype(float))
+        return {
+            'count': count,
+            'count_error': count_error,
+            'unmatched_bound': float(unmatched_bound),
+            'total': fees_total,
+            'total_error': fees_error,
+            'avg_discount': discount_total / discount_count if discount_count else float('nan'),
+            'sample_rows': int(n.sum()),
+            'exact': not plan.ranges or bool((n == N).all()),
+        }
+    
+    def nbytes(self):
+        """Approximate memory held by the summary"""
+        return self.strata_counts.nbytes + sum(values.nbytes for values in self.sample.values())
+
+
+class StreamingSummary:
+    """Mergeable aggregates of the data, built one chunk at a time
+    Keeps the row count of every combination of BITMAP_PREDICATES and a value
+    histogram of each range column. Together they answer every intent exactly,
+    so memory is bounded by the chunk size and the number of distinct values.
+    Offers the same count() as BitmapIndex. With sample_per_stratum it also
+    keeps an ApproximateSummary for approximate mode.
+    """
+    def __init__(self, sample_per_stratum=None, seed=0):
+        self.n_rows = 0
+        self.combination_counts = np.zeros(1 << len(BITMAP_PREDICATES), dtype=np.int64)
+        self.histograms = {column: pd.Series(dtype='int64') for column in RANGE_COLUMNS}
+        self.cube = SummaryCube()
+        self.approx = ApproximateSummary(sample_per_stratum, seed) if sample_per_stratum else None
+        self.errors = {}
+        self.range_errors = {}
+    
+    def update(self, df):
+        """Add the rows of one chunk"""
+        self.n_rows += len(df)
+        self.cube = self.cube.extended(df)
+        
+        combination = predicate_combinations(df, self.errors)
+        self.combination_counts += np.bincount(combination, minlength=len(self.combination_counts))
+        if self.approx is not None:
+            self.approx.update(df, combination)
+        
+        for column in RANGE_COLUMNS:
+            if column in self.range_errors:
+                continue
+            try:
+                counts = df[column].value_counts(dropna=True)
+                self.histograms[column] = self.histograms[column].add(counts, fill_value=0).astype('int64')
+            except Exception as e:
+                self.range_errors[column] = e
+    
+    def merge(self, other):
+        """Add the aggregates of another summary"""
+        self.n_rows += other.n_rows
+        self.combination_counts += other.combination_counts
+        self.cube = self.cube.merged(other.cube)
+        if other.approx is not None:
+            self.approx = other.approx if self.approx is None else self.approx.merged(other.approx)
+        for column in RANGE_COLUMNS:
+            self.histograms[column] = self.histograms[column].add(other.histograms[column], fill_value=0).astype('int64')
+        self.errors.update(other.errors)
+        self.range_errors.update(other.range_errors)
+    
+    def count(self, *names):
+        """Count rows matching all of the given predicates"""
+        for name in names:
+            if name in self.errors:
+                raise self.errors[name]
+        
+        bits = list(BITMAP_PREDICATES)
+        wanted = sum(1 << bits.index(name) for name in names)
+        combinations = np.arange(len(self.combination_counts))
+        return int(self.combination_counts[(combinations & wanted) == wanted].sum())
+    
+    def range_indexes(self):
+        """Range indexes over the histograms, plus errors for unusable columns"""
+        indexes = {}
+        for column, histogram in self.histograms.items():
+            if column not in self.range_errors:
+                indexes[column] = WeightedRangeIndex(histogram.index.to_numpy(), histogram.to_numpy())
+        return indexes, dict(self.range_errors)
+    
+    def nbytes(self):
+        """Approximate memory held by the summary"""
+        approx = self.approx.nbytes() if self.approx is not None else 0
+        return self.combination_counts.nbytes + self.cube.nbytes() + approx + sum(
+            int(histogram.memory_usage(index=True)) for histogram in self.histograms.values()
+        )
+
+
+class LatencyStats:
+    """Per-intent, per-stage latency histograms
+    Durations go into log-spaced buckets (4 per doubling, 1 us to ~1000 s),
+    so memory stays fixed however many questions are answered, and
+    percentiles are accurate to within one bucket (about 19%).
+    """
+    BUCKET_EDGES = [1e-6 * 2 ** (i / 4) for i in range(120)]
+    STAGES = ('parse', 'filter', 'format', 'total', 'speech')
+    
+    def __init__(self):
+        self.histograms = {}
+        self.lock = threading.Lock()
+    
+    def add(self, intent, stage, seconds):
+        """Record one duration"""
+        self.record(intent, {stage: seconds})
+    
+    def record(self, intent, stages):
+        """Record the durations of several stages of one answer"""
+        with self.lock:
+            for stage, seconds in stages.items():
+                histogram = self.histograms.get((intent, stage))
+                if histogram is None:
+                    histogram = self.histograms[(intent, stage)] = {
+                        'counts': [0] * (len(self.BUCKET_EDGES) + 1), 'calls': 0, 'total': 0.0, 'max': 0.0,
+                    }
+                # Bucket index straight from the log instead of searching BUCKET_EDGES
+                bucket = math.ceil(4 * math.log2(seconds / 1e-6)) if seconds > 1e-6 else 0
+                histogram['counts'][min(bucket, len(self.BUCKET_EDGES))] += 1
+                histogram['calls'] += 1
+                histogram['total'] += seconds
+                if seconds > histogram['max']:
+                    histogram['max'] = seconds
+    
+    def percentile(self, histogram, q):
+        """Upper edge of the bucket holding the q-th percentile (capped at max)"""
+        rank = q / 100 * histogram['calls']
+        seen = 0
+        for bucket, count in enumerate(histogram['counts']):
+            seen += count
+            if seen >= rank and count:
+                edge = self.BUCKET_EDGES[bucket] if bucket < len(self.BUCKET_EDGES) else histogram['max']
+                return min(edge, histogram['max'])
+        return histogram['max']
+    
+    def summary(self):
+        """{intent: {stage: {calls, p50_ms, p95_ms, max_ms, mean_ms}}}"""
+        with self.lock:
+            histograms = copy.deepcopy(self.histograms)
+        
+        result = {}
+        for (intent, stage), histogram in sorted(histograms.items(), key=lambda item: (item[0][0], self.STAGES.index(item[0][1]))):
+            result.setdefault(intent, {})[stage] = {
+                'calls': histogram['calls'],
+                'p50_ms': round(self.percentile(histogram, 50) * 1000, 3),
+                'p95_ms': round(self.percentile(histogram, 95) * 1000, 3),
+                'max_ms': round(histogram['max'] * 1000, 3),
+                'mean_ms': round(histogram['total'] / histogram['calls'] * 1000, 3),
+            }
+        return result
+    
+    def format(self):
+        """Summary as a text table"""
+        summary = self.summary()
+        if not summary:
+            return "No questions answered yet"
+        
+        lines = [f"{'intent':22s} {'stage':7s} {'calls':>6s} {'p50 ms':>9s} {'p95 ms':>9s} {'max ms':>9s}"]
+        for intent, stages in summary.items():
+            for stage, row in stages.items():
+                lines.append(f"{intent:22s} {stage:7s} {row['calls']:6d} {row['p50_ms']:9.3f} {row['p95_ms']:9.3f} {row['max_ms']:9.3f}")
+        return "\n".join(lines)
+    
+    def export(self, path):
+        """Write the summary as JSON"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+class ResultCache:
+    """Bounded LRU cache of answers with hit/miss counters
+    Keys start with the data version, so answers computed before a reload
+    are never returned afterwards.
+    """
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        """(True, value) for a cached key, else (False, None)"""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, self.entries[key]
+            self.misses += 1
+            return False, None
+    
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry when full"""
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop every entry (the counters are kept)"""
+        with self.lock:
+            self.entries.clear()
+    
+    def stats(self):
+        """Size and counters"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+    
+    def format(self):
+        """Stats as one line of text"""
+        stats = self.stats()
+        return (
+            f"Cache: {stats['size']}/{stats['maxsize']} answers, {stats['hits']} hits, "
+            f"{stats['misses']} misses ({stats['hit_rate']:.0%} hit rate), {stats['evictions']} evicted"
+        )
+
+
+class QueryLog:
+    """Appends one JSON line per answered question to a file
+    Each line has the time, question, resolved intent and parameters,
+    whether the answer came from the result cache, and milliseconds per
+    stage. Answers only queue their record; a background thread writes the
+    queued lines every flush_seconds and on close (also run at exit), so
+    logging adds about a microsecond per answer.
+    """
+    def __init__(self, path, flush_seconds=1.0):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.file = open(path, "a", encoding="utf-8")
+        self.pending = collections.deque()
+        self.lines = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        
+        self.thread = threading.Thread(target=self.run, name="query-log", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+    
+    def write(self, question, intent, params, cached, stages):
+        """Queue the record of one answer"""
+        self.pending.append((time.time(), question, intent, tuple(params), cached, stages))
+    
+    def run(self):
+        """Writer loop"""
+        while not self.stopped.wait(self.flush_seconds):
+            self.flush()
+    
+    def flush(self):
+        """Write the queued records"""
+        with self.lock:
+            if self.file.closed:
+                return
+            lines = []
+            while self.pending:
+                timestamp, question, intent, params, cached, stages = self.pending.popleft()
+                lines.append(json.dumps({
+                    'time': time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(timestamp)),
+                    'question': question,
+                    'intent': intent,
+                    'params': list(params),
+                    'cached': cached,
+                    'ms': round(stages['total'] * 1000, 3),
+                    'stages': {stage: round(seconds * 1000, 3) for stage, seconds in stages.items() if stage != 'total'},
+                }, ensure_ascii=False) + "\n")
+            if lines:
+                self.file.write("".join(lines))
+                self.file.flush()
+                self.lines += len(lines)
+    
+    def close(self):
+        """Write what is queued and close the log"""
+        self.stopped.set()
+        self.flush()
+        with self.lock:
+            self.file.close()
+
+
+def read_query_log(path):
+    """Records of a query log, or of a questions file in the --questions format
+    Blank and malformed lines are skipped; plain JSON strings become
+    {'question': text}.
+    """
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, str):
+                record = {'question': record}
+            if isinstance(record, dict) and isinstance(record.get('question'), str):
+                records.append(record)
+    return records
+
+
+class SpeechCache:
+    """Rendered speech clips on disk, keyed by text and voice settings
+    Clips are evicted least recently used first once the directory holds
+    more than max_bytes. Use is tracked by file modification time, so the
+    order survives restarts.
+    """
+    def __init__(self, directory, max_bytes=50 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.rendered = 0
+        self.lock = threading.Lock()
+        
+        os.makedirs(directory, exist_ok=True)
+        clips = []
+        for name in os.listdir(directory):
+            if name.endswith(".wav"):
+                stat = os.stat(os.path.join(directory, name))
+                clips.append((stat.st_mtime, name[:-len(".wav")], stat.st_size))
+        for mtime, key, size in sorted(clips):
+            self.entries[key] = size
+    
+    def key(self, text, voice):
+        """Cache key for text spoken with the given voice settings"""
+        return hashlib.sha1(json.dumps([text, voice], sort_keys=True).encode()).hexdigest()
+    
+    def path(self, key):
+        """Clip file for a key"""
+        return os.path.join(self.directory, key + ".wav")
+    
+    def get(self, text, voice):
+        """Path of the clip for text, or None; marks it as recently used"""
+        key = self.key(text, voice)
+        with self.lock:
+            if key not in self.entries or not os.path.exists(self.path(key)):
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        os.utime(self.path(key))
+        return self.path(key)
+    
+    def __contains__(self, item):
+        text, voice = item
+        return self.key(text, voice) in self.entries
+    
+    def add(self, text, voice, render):
+        """Render text with render(path) and keep the clip
+        render returns False when it was cut short; that clip is discarded.
+        """
+        key = self.key(text, voice)
+        temp_path = self.path(key) + ".tmp"
+        complete = render(temp_path)
+        if not complete or not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        os.replace(temp_path, self.path(key))
+        
+        with self.lock:
+            self.entries[key] = os.path.getsize(self.path(key))
+            self.entries.move_to_end(key)
+            self.rendered += 1
+            while sum(self.entries.values()) > self.max_bytes and len(self.entries) > 1:
+                old_key, size = self.entries.popitem(last=False)
+                try:
+                    os.remove(self.path(old_key))
+                except OSError:
+                    pass
+    
+    def format(self):
+        """Stats as one line of text"""
+        with self.lock:
+            size_mb = sum(self.entries.values()) / 1e6
+            return (
+                f"Speech cache: {len(self.entries)} clips ({size_mb:.1f} MB of {self.max_bytes / 1e6:.0f} MB), "
+                f"{self.hits} played from cache, {self.misses} synthesized live, {self.rendered} rendered"
+            )
+
+
+def audio_player():
+    """Something that can play a WAV file here, or None
+    Returns ('winsound', None) on Windows, else ('command', argv) for the
+    first of afplay, paplay and aplay found.
+    """
+    if sys.platform == 'win32':
+        return ('winsound', None)
+    for command in (['afplay'], ['paplay'], ['aplay', '-q']):
+        if shutil.which(command[0]):
+            return ('command', command)
+    return None
+
+
+def clip_seconds(path):
+    """Length of a WAV clip in seconds (0 when it can't be read)"""
+    import wave
+    try:
+        with wave.open(path) as clip:
+            return clip.getnframes() / float(clip.getframerate())
+    except Exception:
+        return 0.0
+
+
+class SpeechWorker:
+    """Speaks text on its own thread so the prompt doesn't wait for it
+    Only the newest text is kept: a new answer replaces queued text that
+    hasn't started yet and cuts short the one being spoken.
+    
+    With a SpeechCache, texts already rendered are played from disk instead
+    of being synthesized. Texts spoken live, and texts passed to prerender(),
+    are rendered to the cache while the worker is otherwise idle.
+    """
+    def __init__(self, rate=165, cache=None):
+        self.rate = rate
+        self.cache = cache
+        self.player = audio_player() if cache is not None else None
+        self.playback = None
+        self.voice_settings = None
+        self.render_queue = collections.deque()
+        self.engine = None
+        self.pending = None
+        self.speaking = False
+        self.render_interrupted = False
+        self.stopped = False
+        self.utterances = 0
+        self.speech_seconds = 0.0
+        self.init_seconds = None
+        self.condition = threading.Condition()
+        self.ready = threading.Event()
+        
+        self.thread = threading.Thread(target=self.run, name="speech", daemon=True)
+        self.thread.start()
+    
+    def run(self):
+        """Worker loop: the engine is created and used only on this thread"""
+        start = time.perf_counter()
+        try:
+            import pyttsx3
+            self.engine = pyttsx3.init()
+            self.engine.setProperty("rate", self.rate)
+            self.engine.connect("started-word", self.on_word)
+            self.voice_settings = {
+                'rate': self.rate,
+                'voice': str(self.engine.getProperty("voice")),
+                'volume': self.engine.getProperty("volume"),
+            }
+        except Exception:
+            self.engine = None
+        self.init_seconds = time.perf_counter() - start
+        self.ready.set()
+        
+        while self.engine is not None:
+            with self.condition:
+                while self.pending is None and not self.render_queue and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                if self.pending is None:
+                    text = self.render_queue.popleft()
+                else:
+                    text, self.pending = self.pending, None
+                    self.speaking = True
+            
+            if not self.speaking:
+                self.render(text)
+                continue
+            
+            start = time.perf_counter()
+            clip = self.cache.get(text, self.voice_settings) if self.player else None
+            try:
+                if clip:
+                    self.play(clip)
+                else:
+                    self.engine.say(text)
+                    self.engine.runAndWait()
+                    if self.player:
+                        self.render_queue.append(text)
+            except Exception:
+                pass
+            
+            with self.condition:
+                self.speaking = False
+                self.utterances += 1
+                self.speech_seconds += time.perf_counter() - start
+                self.condition.notify_all()
+    
+    def on_word(self, name, location, length):
+        """Engine callback before each word, on the worker thread: stop
+        speaking when newer text is waiting (say() never touches the engine)
+        A render is only stopped when the worker is, and is then discarded.
+        """
+        if self.speaking:
+            if self.pending is not None or self.stopped:
+                self.engine.stop()
+        elif self.stopped:
+            self.render_interrupted = True
+            self.engine.stop()
+    
+    def render(self, text):
+        """Render text into the cache (on the worker thread)"""
+        if (text, self.voice_settings) in self.cache:
+            return
+        
+        def save(path):
+            self.render_interrupted = False
+            self.engine.save_to_file(text, path)
+            self.engine.runAndWait()
+            return not self.render_interrupted
+        
+        try:
+            self.cache.add(text, self.voice_settings, save)
+        except Exception:
+            pass
+    
+    def play(self, path):
+        """Play a cached clip; say() can cut it short"""
+        kind, command = self.player
+        if kind == 'winsound':
+            import winsound
+            winsound.PlaySound(path, winsound.SND_FILENAME | winsound.SND_ASYNC)
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending is not None or self.stopped, clip_seconds(path))
+            winsound.PlaySound(None, winsound.SND_PURGE)
+            return
+        
+        import subprocess
+        with self.condition:
+            if self.pending is not None:
+                return
+            self.playback = subprocess.Popen(command + [path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.playback.wait()
+        with self.condition:
+            self.playback = None
+    
+    def prerender(self, texts):
+        """Render texts into the cache in the background, when idle"""
+        if self.player is None:
+            return
+        with self.condition:
+            self.render_queue.extend(texts)
+            self.condition.notify_all()
+    
+    def say(self, text):
+        """Queue text, replacing anything not yet spoken"""
+        with self.condition:
+            self.pending = text
+            # Live speech stops at the next word (see on_word); a clip is cut now
+            if self.speaking and self.playback is not None:
+                self.playback.terminate()
+            self.condition.notify_all()
+    
+    def wait_idle(self, timeout=None):
+        """Wait until everything queued has been spoken"""
+        if not self.ready.wait(timeout) or self.engine is None:
+            return
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self.condition:
+            while self.pending is not None or self.speaking:
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return
+                self.condition.wait(remaining)
+    
+    def close(self):
+        """Stop the worker thread"""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+
+class IntentModel:
+    """Fallback classifier for questions the keyword rules don't match
+    Wraps the scikit-learn pipeline in intent_model.pkl. The first unmatched
+    question starts loading it (and importing scikit-learn) on a background
+    thread; single questions are answered as UNKNOWN until it is ready (batches
+    wait for it), and the model then stays loaded. The model spreads probability over ~130 classes, so the
+    threshold defaults to twice the uniform probability.
+    """
+    def __init__(self, path, threshold=None):
+        self.path = path
+        self.threshold = threshold
+        self.model = None
+        self.error = None
+        self.thread = None
+        self.lock = threading.Lock()
+    
+    def start_loading(self):
+        """Load the model in the background if that hasn't started yet"""
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.load, name="intent-model", daemon=True)
+                self.thread.start()
+    
+    def load(self):
+        """Unpickle the model (runs on the loader thread)"""
+        try:
+            import warnings
+            import joblib
+            with warnings.catch_warnings():
+                # Pickled with a different scikit-learn version
+                warnings.simplefilter("ignore")
+                self.model = joblib.load(self.path)
+        except Exception as e:
+            self.error = e
+    
+    def wait(self, timeout=None):
+        """Start loading if needed and wait for the model (None if unavailable)"""
+        self.start_loading()
+        self.thread.join(timeout)
+        return self.model
+    
+    def predict(self, questions, block=False):
+        """Intent and confidence for each question, in one predict_proba call
+        Returns ("UNKNOWN", confidence) when the best class is below the
+        threshold or has no matching bot intent. Without block, returns None
+        while the model is still loading.
+        """
+        model = self.wait(timeout=None if block else 0)
+        if model is None and self.thread.is_alive():
+            return None
+        if model is None or not questions:
+            return [("UNKNOWN", 0.0) for _ in questions]
+        
+        probabilities = model.predict_proba(questions)
+        threshold = self.threshold if self.threshold is not None else 2.0 / len(model.classes_)
+        
+        results = []
+        for row in probabilities:
+            best = int(np.argmax(row))
+            intent = MODEL_INTENT_MAP.get(str(model.classes_[best]), "UNKNOWN")
+            results.append((intent if row[best] >= threshold else "UNKNOWN", float(row[best])))
+        return results
+
+
+def queried_columns(file_columns):
+    """Map each queried column to its name in a file's header
+    A single other-year column such as ay25_enrollment_status stands in for
+    ay26_enrollment_status when a file doesn't have the latter.
+    """
+    names = {column: column for column in CSV_DTYPES if column in file_columns}
+    if ENROLLMENT_COLUMN not in names:
+        others = [column for column in file_columns if ENROLLMENT_PATTERN.fullmatch(str(column))]
+        if len(others) == 1:
+            names[ENROLLMENT_COLUMN] = others[0]
+    return names
+
+
+def checked_dtypes(source, dtypes, chunksize=1000000, **kwargs):
+    """dtypes every value of a CSV fits
+    Each numeric or boolean column is checked against its dtype on its own;
+    those with a value that doesn't fit are read as text (the values
+    whole-file inference leaves in them) and the rest keep their dtype. So
+    every chunk of a file is read the same way whether it is loaded,
+    streamed or exported.
+    """
+    checked = dict(dtypes)
+    for name, dtype in dtypes.items():
+        if dtype == 'category':
+            continue  # any text fits
+        try:
+            if hasattr(source, 'seek'):
+                source.seek(0)
+            for chunk in pd.read_csv(source, usecols=[name], dtype={name: dtype}, chunksize=chunksize, **kwargs):
+                pass
+        except (ValueError, TypeError):
+            checked[name] = str
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return checked
+
+
+def summarize_csv(path, chunksize, sample_per_stratum=None):
+    """Aggregate one CSV chunk by chunk into a StreamingSummary
+    Module-level so it can run in a worker process. Returns the summary, the
+    header and the queried columns found. sample_per_stratum also builds
+    the ApproximateSummary, with a random seed of its own per file.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    names = queried_columns(header)
+    renames = {file_name: column for column, file_name in names.items()}
+    dtypes = {file_name: CSV_DTYPES[column] for column, file_name in names.items()}
+    seed = int(hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:8], 16)
+    
+    try:
+        summary = StreamingSummary(sample_per_stratum, seed)
+        for chunk in pd.read_csv(path, usecols=list(renames), dtype=dtypes, chunksize=chunksize):
+            summary.update(chunk.rename(columns=renames))
+    except (ValueError, TypeError) as e:
+        print(f"Warning: typed load of '{path}' failed ({e}), reading the columns that don't fit as text")
+        summary = StreamingSummary(sample_per_stratum, seed)
+        dtypes = checked_dtypes(path, dtypes, chunksize)
+        for chunk in pd.read_csv(path, usecols=list(renames), dtype=dtypes, chunksize=chunksize):
+            summary.update(chunk.rename(columns=renames))
+    
+    return summary, header, list(names)
+
+
+def resolve_csv_paths(csv_path):
+    """Files to query when csv_path names several, else None
+    csv_path may be a list of paths, a directory (all *.csv in it) or a glob.
+    """
+    if isinstance(csv_path, (list, tuple)):
+        return list(csv_path)
+    if os.path.isdir(csv_path):
+        return sorted(glob.glob(os.path.join(csv_path, "*.csv")))
+    if any(char in csv_path for char in "*?["):
+        return sorted(glob.glob(csv_path))
+    return None
+
+
+def range_mean(result):
+    """Mean of a SortedRangeIndex result (NaN when nothing matched)"""
+    return result['total'] / result['count'] if result['count'] else float('nan')
+
+
+def condition_field(text):
+    """Column named last in text: '% discount', 'fees_paid' or None"""
+    field = None
+    for match in FIELD_PATTERN.finditer(text):
+        field = '% discount' if match.group(1) else 'fees_paid'
+    return field
+
+
+def parse_conditions(text):
+    """Count intents and numeric conditions in a lower-cased question
+    Returns (intents, ranges) where ranges are (column, op, bounds) with op
+    'more', 'less' or 'between'. Each comparison belongs to the fees or
+    discount word just before it, else just after it, else the one before.
+    """
+    groups = set()
+    for match in QUESTION_PATTERN.finditer(text):
+        if match.group(2):
+            groups |= KEYWORD_GROUPS[match.group(2)]
+    
+    intents = []
+    if 'registration' in text or 'registered' in text:
+        intents.append("REGISTRATION")
+    if 'admission' in groups:
+        intents.append("ADMISSION_CANCELLED" if 'cancelled' in groups else "ADMISSION")
+    if 'no_batch' in groups or 'with_batch' in groups:
+        intents.append("NO_BATCH" if 'no_batch' in groups else "WITH_BATCH")
+    if 'not_eligible' in groups or 'eligible' in groups:
+        intents.append("NOT_ELIGIBLE" if 'not_eligible' in groups else "ELIGIBLE")
+    
+    matches = list(CONDITION_PATTERN.finditer(text))
+    ranges = []
+    field = None
+    for i, match in enumerate(matches):
+        before = text[matches[i - 1].end() if i else 0:match.start()]
+        after = text[match.end():matches[i + 1].start() if i + 1 < len(matches) else len(text)]
+        if '%' in match.group(0):
+            field = '% discount'
+        else:
+            field = condition_field(before) or condition_field(after) or field or 'fees_paid'
+        
+        if match.group(1):
+            ranges.append((field, 'between', (int(match.group(1)), int(match.group(2)))))
+        elif match.group(3):
+            ranges.append((field, COMPARISONS[match.group(3)], (int(match.group(4)),)))
+        else:
+            ranges.append((field, COMPARISONS[match.group(6)], (int(match.group(5)),)))
+    return intents, ranges
+
+
+def range_condition_mask(values, op, bounds):
+    """Rows of a numeric array meeting a condition (same bounds as SortedRangeIndex)"""
+    if op == 'more':
+        return values > bounds[0]
+    if op == 'less':
+        return values < bounds[0]
+    return (values >= bounds[0]) & (values <= bounds[1])
+
+
+def describe_range(column, op, bounds):
+    """'fees_paid > 5000', '% discount between 20 and 60'"""
+    if op == 'between':
+        return f"{column} between {bounds[0]} and {bounds[1]}"
+    return f"{column} {'>' if op == 'more' else '<'} {bounds[0]}"
+
+
+class QueryPlan:
+    """Conditions of a compound question, all of which must hold
+    A tree of one AND node: the count intents' base predicates, answered
+    together from the bitmap index, and numeric range conditions.
+    """
+    def __init__(self, intents, ranges):
+        self.intents = tuple(intents)
+        self.ranges = tuple(ranges)
+        self.predicates = tuple(dict.fromkeys(
+            name for intent in self.intents for name in COUNT_INTENTS[intent][1]
+        ))
+    
+    def __len__(self):
+        return len(self.intents) + len(self.ranges)
+    
+    def key(self):
+        """Cache key: the same conditions in any order give the same key"""
+        return ("COMPOUND", tuple(sorted(self.intents)), tuple(sorted(self.ranges)))
+    
+    def describe(self):
+        """All conditions as text"""
+        return [COUNT_INTENTS[intent][0] for intent in self.intents] + [describe_range(*r) for r in self.ranges]
+
+
+def plan_mask(plan, chunk):
+    """Rows of a frame meeting every condition of a plan"""
+    mask = np.ones(len(chunk), dtype=bool)
+    for name in plan.predicates:
+        column, predicate = BITMAP_PREDICATES[name]
+        mask &= predicate_mask(column, name, predicate, chunk[column])
+    for column, op, bounds in plan.ranges:
+        mask &= range_condition_mask(chunk[column].to_numpy(dtype=float, na_value=np.nan), op, bounds)
+    return mask
+
+
+def read_typed_chunks(path, usecols, dtypes, chunksize):
+    """Chunks of a CSV with explicit dtypes
+    Chunks are yielded as they are read, so the dtypes are checked first
+    (checked_dtypes): a column with a value that doesn't fit is text in
+    every chunk, the same as when the file is loaded.
+    """
+    checked = checked_dtypes(path, dtypes, chunksize)
+    if checked != dtypes:
+        print(f"Warning: typed read of '{path}' failed, reading the columns that don't fit as text")
+    yield from pd.read_csv(path, usecols=usecols, dtype=checked, chunksize=chunksize)
+
+
+def iter_matching_rows(paths, plan, columns, chunksize=100000):
+    """Yield frames of the rows meeting a plan, reading the CSVs chunk by chunk
+    Only one chunk is in memory at a time, and only the output columns and
+    the columns the plan tests are parsed. Queried columns carry their usual
+    names (ay25_enrollment_status reads as ay26_enrollment_status).
+    """
+    for path in paths:
+        header = pd.read_csv(path, nrows=0).columns
+        names = queried_columns(header)
+        renames = {file_name: column for column, file_name in names.items()}
+        dtypes = {file_name: CSV_DTYPES[column] for column, file_name in names.items()}
+        needed = {names.get(column, column) for column in columns} | set(renames)
+        
+        for chunk in read_typed_chunks(path, lambda name: name in needed, dtypes, chunksize):
+            chunk = chunk.rename(columns=renames)
+            yield chunk.loc[plan_mask(plan, chunk)].reindex(columns=columns)
+
+
+def release_blocks(blocks):
+    """Close and remove shared memory blocks"""
+    for block in blocks:
+        try:
+            block.close()
+            block.unlink()
+        except (OSError, BufferError):
+            pass
+
+
+class SharedColumns:
+    """The arrays partition workers read, copied once into shared memory
+    The bitmap index's packed bitsets and the range columns as float64 (NaN
+    for missing). Workers attach to the blocks by name; the blocks are
+    removed when this object is garbage collected or at exit.
+    """
+    def __init__(self, df, bitmap_index):
+        from multiprocessing import shared_memory
+        self.n_rows = len(df)
+        self.errors = dict(bitmap_index.errors)
+        self.layout = {}
+        blocks = []
+        
+        arrays = {'bits:' + name: bits for name, bits in bitmap_index.bitsets.items()}
+        for column in RANGE_COLUMNS:
+            if column in df.columns:
+                arrays[column] = df[column].to_numpy(dtype=float, na_value=np.nan)
+        
+        for name, values in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes))
+            blocks.append(block)
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+            self.layout[name] = (block.name, values.dtype.str, len(values))
+        self.nbytes = sum(values.nbytes for values in arrays.values())
+        
+        weakref.finalize(self, release_blocks, blocks)
+
+
+# Shared memory attached in a partition worker: block name -> (block, array)
+_ATTACHED_BLOCKS = {}
+
+
+def attach_shared(layout):
+    """Arrays of a SharedColumns layout, attaching new blocks and dropping old ones"""
+    from multiprocessing import shared_memory
+    current = {block_name for block_name, dtype, length in layout.values()}
+    for block_name in set(_ATTACHED_BLOCKS) - current:
+        block, values = _ATTACHED_BLOCKS.pop(block_name)
+        del values
+        try:
+            block.close()
+        except BufferError:
+            pass
+    
+    arrays = {}
+    for name, (block_name, dtype, length) in layout.items():
+        if block_name not in _ATTACHED_BLOCKS:
+            block = shared_memory.SharedMemory(name=block_name)
+            _ATTACHED_BLOCKS[block_name] = (block, np.ndarray(length, dtype=dtype, buffer=block.buf))
+        arrays[name] = _ATTACHED_BLOCKS[block_name][1]
+    return arrays
+
+
+def evaluate_partition(layout, predicates, ranges, start, stop):
+    """Aggregates of rows [start, stop) meeting every condition
+    Runs in a partition worker. start is a multiple of 8, so the rows' bits
+    start on a byte of the packed bitsets. Returns the count, fees_paid
+    total, and the % discount sum and count of non-missing values.
+    """
+    arrays = attach_shared(layout)
+    if predicates:
+        bits = arrays['bits:' + predicates[0]][start // 8:(stop + 7) // 8].copy()
+        for name in predicates[1:]:
+            np.bitwise_and(bits, arrays['bits:' + name][start // 8:(stop + 7) // 8], out=bits)
+        rows = np.flatnonzero(np.unpackbits(bits, count=stop - start)) + start
+    else:
+        rows = np.arange(start, stop)
+    
+    for column, op, bounds in ranges:
+        rows = rows[range_condition_mask(arrays[column][rows], op, bounds)]
+    
+    fees = arrays['fees_paid'][rows] if 'fees_paid' in arrays else np.zeros(0)
+    discounts = arrays['% discount'][rows] if '% discount' in arrays else np.zeros(0)
+    discounts = discounts[np.isfinite(discounts)]
+    return len(rows), float(np.nansum(fees)), float(discounts.sum()), len(discounts)
+
+
+class PartitionPool:
+    """Persistent worker processes that evaluate plans over row partitions
+    Each query sends the workers only the plan, a SharedColumns layout and
+    a row range; the partial counts and sums are added up here. Workers are
+    started with 'spawn', since the bot already runs threads.
+    """
+    def __init__(self, workers):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        # Start the workers now (e.g. while the data loads), not on the first query
+        for _ in range(workers):
+            self.executor.submit(os.getpid)
+    
+    def partitions(self, n_rows):
+        """One row range per worker, each starting on a multiple of 8"""
+        step = -(-n_rows // self.workers)
+        step = max(8, (step + 7) // 8 * 8)
+        return [(start, min(start + step, n_rows)) for start in range(0, n_rows, step)]
+    
+    def evaluate(self, shared, predicates, ranges):
+        """Count, fees_paid total and mean % discount of rows meeting every
+        condition; ranges are evaluated in the order given
+        """
+        for name in predicates:
+            if name in shared.errors:
+                raise shared.errors[name]
+        for column, op, bounds in ranges:
+            if column not in shared.layout:
+                raise KeyError(column)
+        
+        futures = [
+            self.executor.submit(evaluate_partition, shared.layout, tuple(predicates), tuple(ranges), start, stop)
+            for start, stop in self.partitions(shared.n_rows)
+        ]
+        count, total, discount_sum, discount_count = 0, 0.0, 0.0, 0
+        for future in futures:
+            part = future.result()
+            count += part[0]
+            total += part[1]
+            discount_sum += part[2]
+            discount_count += part[3]
+        
+        return {
+            'count': count,
+            'total': total,
+            'avg_discount': discount_sum / discount_count if discount_count else float('nan'),
+        }
+    
+    def close(self):
+        """Stop the worker processes"""
+        self.executor.shutdown()
+
 
 class StudentQueryBot:
-    def __init__(self, csv_path="AY26.csv"):
-        """Initialize the chatbot"""
+    def __init__(self, csv_path="AY26.csv", engine=None, snapshot=True, streaming=False, chunksize=100000,
+                 async_speech=True, voice=True, processes=None, intent_model=os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_model.pkl"),
+                 profile_slow=None, cache_size=256, approximate=False, sample_per_stratum=500,
+                 speech_cache=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".speech_cache"),
+                 speech_cache_mb=50, partitions=None, query_log=None):
+        """Initialize the chatbot
+        csv_path: one CSV, or several as a list, a directory or a glob
+                  (e.g. "exports/AY2*.csv"); several files are summarized
+                  in parallel processes (up to processes, default one
+                  per core) and answered combined or per file
+        engine: optional pandas CSV parser engine, e.g. 'pyarrow'
+        snapshot: reuse/keep a memory-mapped snapshot next to the CSV
+        streaming: read the CSV in chunks of chunksize rows into a
+                   StreamingSummary instead of keeping it in memory
+        async_speech: speak on a background SpeechWorker instead of
+                      blocking each turn until speech finishes
+        voice: False for headless use; the voice engine is otherwise
+               started on the first speak() call
+        intent_model: pickled classifier tried when no keyword rule
+                      matches (None to disable)
+        profile_slow: seconds; when set, every answer runs under cProfile
+                      and the profile of the slowest one over this limit
+                      is kept in slow_profile
+        cache_size: answers kept in the LRU result cache (0 to disable)
+        approximate: answer counts, range and combined questions from an
+                     ApproximateSummary (stratified sample of
+                     sample_per_stratum rows per predicate combination)
+                     with confidence intervals
+        speech_cache: directory of rendered speech clips, capped at
+                      speech_cache_mb (None to always synthesize)
+        partitions: worker processes that evaluate combined questions
+                    in parallel over row partitions in shared memory
+                    (in-memory data only; default off)
+        query_log: JSONL file to append each question, its intent,
+                   parameters and timings to (see QueryLog)
+        """
         self.csv_path = csv_path
+        self.csv_paths = resolve_csv_paths(csv_path)
+        if self.csv_paths is not None:
+            streaming = True
+        self.csv_engine = engine
+        self.snapshot = ColumnSnapshot(csv_path) if snapshot and not streaming else None
+        self.streaming = streaming
+        self.chunksize = chunksize
+        self.processes = processes
         self.df = None
+        self.stream_summary = None
+        self.file_summaries = {}
+        self.file_indexes = {}
+        self.header = None
+        self.source_state = None
+        self.load_report = None
+        self.bitmap_index = None
+        self.range_indexes = {}
+        self.range_index_errors = {}
+        self.summary_cube = None
+        self.data_lock = threading.RLock()
+        self.watch_thread = None
+        self.watch_stop = None
+        self.batch_memo = None
+        self.result_cache = ResultCache(cache_size)
+        self.data_version = 0
+        self.cache_scope = None
+        self.approximate = approximate
+        self.sample_per_stratum = sample_per_stratum
+        self.approx_summary = None
+        self.speech_cache_dir = speech_cache
+        self.speech_cache_mb = speech_cache_mb
+        self.partition_pool = PartitionPool(partitions) if partitions and partitions > 1 and not streaming else None
+        self.shared_columns = None
+        self.intent_model = IntentModel(intent_model) if intent_model else None
+        self.model_intents = {}
+        self.async_speech = async_speech
+        self.voice = voice
+        self.tts_started = False
+        self.speech = None
+        self.turn_timings = []
+        self.latency = LatencyStats()
+        self.trace = threading.local()
+        self.profile_slow = profile_slow
+        self.slow_profile = None
+        self.query_log = QueryLog(query_log) if query_log else None
+        self.startup_timings = {'imports': IMPORT_SECONDS}
         self.engine = None
         
         self.load_data()
-        self.init_tts()
     
-    def load_data(self):
-        """Load CSV"""
+    def load_data(self):
+        """Load CSV"""
+        try:
+            if self.csv_paths is not None:
+                if not self.csv_paths:
+                    print(f"Error: No CSV files found for '{self.csv_path}'!")
+                    sys.exit(1)
+            elif not os.path.exists(self.csv_path):
+                print(f"Error: File '{self.csv_path}' not found!")
+                sys.exit(1)
+            
+            start = time.perf_counter()
+            if self.csv_paths is not None:
+                self.header, self.stream_summary, self.source_state, self.load_report = self.read_files()
+            elif self.streaming:
+                self.header, self.stream_summary, self.source_state, self.load_report = self.read_stream()
+            else:
+                self.header, self.df, self.source_state, self.load_report = self.read_source()
+            
+            loaded = time.perf_counter()
+            self.build_indexes()
+            self.startup_timings['data_load'] = loaded - start
+            self.startup_timings['index_build'] = time.perf_counter() - loaded
+            
+        except Exception as e:
+            print(f"Error loading CSV: {e}")
+            sys.exit(1)
+    
+    def read_source(self):
+        """Read csv_path, or its snapshot when that is current
+        Returns the header, the frame, the source state and a load report.
+        """
+        start = time.perf_counter()
+        header = pd.read_csv(self.csv_path, nrows=0).columns
+        df = self.load_snapshot()
+        
+        if df is not None:
+            source = 'snapshot'
+            state = {key: self.snapshot.manifest[key] for key in ('size', 'mtime_ns', 'sha1')}
+        else:
+            source = self.csv_engine or 'c'
+            state = source_state(self.csv_path)
+            df = self.read_csv_typed(header, self.csv_path)
+            self.save_snapshot(df, state)
+        
+        report = self.build_load_report(df, header, time.perf_counter() - start, source)
+        return header, df, state, report
+    
+    def read_stream(self):
+        """Aggregate csv_path chunk by chunk into a StreamingSummary
+        Returns the header, the summary, the source state and a load report.
+        """
+        start = time.perf_counter()
+        state = source_state(self.csv_path)
+        summary, header, columns = summarize_csv(self.csv_path, self.chunksize, self.approx_sample_size())
+        
+        report = {
+            'rows': summary.n_rows,
+            'columns_loaded': len(columns),
+            'columns_skipped': len(header) - len(columns),
+            'seconds': time.perf_counter() - start,
+            'file_mb': os.path.getsize(self.csv_path) / 1e6,
+            'memory_mb': summary.nbytes() / 1e6,
+            'source': f"streamed in chunks of {self.chunksize:,}",
+        }
+        return header, summary, state, report
+    
+    def read_files(self):
+        """Summarize each file of csv_paths in its own process, then merge
+        Summaries merge exactly, so combined answers match one big file.
+        Per-file summaries are kept in file_summaries. Returns the same
+        tuple as read_stream, without a header or source state.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        start = time.perf_counter()
+        processes = min(len(self.csv_paths), self.processes or os.cpu_count() or 1)
+        chunksizes = [self.chunksize] * len(self.csv_paths)
+        sample_sizes = [self.approx_sample_size()] * len(self.csv_paths)
+        
+        if processes > 1:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                results = list(pool.map(summarize_csv, self.csv_paths, chunksizes, sample_sizes))
+        else:
+            results = list(map(summarize_csv, self.csv_paths, chunksizes, sample_sizes))
+        
+        self.file_summaries = {path: summary for path, (summary, header, columns) in zip(self.csv_paths, results)}
+        combined = StreamingSummary()
+        for summary in self.file_summaries.values():
+            combined.merge(summary)
+        
+        report = {
+            'rows': combined.n_rows,
+            'columns_loaded': max(len(columns) for summary, header, columns in results),
+            'columns_skipped': max(len(header) - len(columns) for summary, header, columns in results),
+            'seconds': time.perf_counter() - start,
+            'file_mb': sum(os.path.getsize(path) for path in self.csv_paths) / 1e6,
+            'memory_mb': sum(summary.nbytes() for summary in self.file_summaries.values()) / 1e6,
+            'source': f"{len(self.csv_paths)} files, {processes} processes",
+        }
+        return None, combined, None, report
+    
+    def read_csv_typed(self, file_columns, source, **kwargs):
+        """Read only the queried columns, with explicit dtypes"""
+        names = queried_columns(file_columns)
+        renames = {file_name: column for column, file_name in names.items()}
+        dtypes = {file_name: CSV_DTYPES[column] for column, file_name in names.items()}
+        
+        try:
+            df = pd.read_csv(source, usecols=list(renames), dtype=dtypes, engine=self.csv_engine, **kwargs)
+        except (ValueError, TypeError) as e:
+            print(f"Warning: typed load failed ({e}), reading the columns that don't fit as text")
+            dtypes = checked_dtypes(source, dtypes, engine=self.csv_engine, **kwargs)
+            df = pd.read_csv(source, usecols=list(renames), dtype=dtypes, engine=self.csv_engine, **kwargs)
+        df = df.rename(columns=renames)
+        
+        # Plain bool when there are no blanks; nullable otherwise
+        if 'free_admission' in df.columns and str(df['free_admission'].dtype) == 'boolean':
+            if not df['free_admission'].isna().any():
+                df['free_admission'] = df['free_admission'].astype(bool)
+        
+        return df
+    
+    def load_snapshot(self):
+        """Map the snapshot of csv_path if it is up to date"""
+        if self.snapshot is None:
+            return None
+        try:
+            return self.snapshot.load()
+        except Exception as e:
+            print(f"Warning: ignoring snapshot ({e})")
+            return None
+    
+    def save_snapshot(self, df, state):
+        """Write a snapshot of the loaded data for the next start"""
+        if self.snapshot is None:
+            return
+        try:
+            self.snapshot.save(df, state)
+        except Exception as e:
+            print(f"Warning: could not write snapshot ({e})")
+    
+    def build_load_report(self, df, header, seconds, source):
+        """Summarize what the typed load read and the memory it saved"""
+        memory = int(df.memory_usage(deep=True, index=False).sum())
+        untyped = sum(object_memory_estimate(df[column]) for column in df.columns)
+        
+        return {
+            'rows': len(df),
+            'columns_loaded': len(df.columns),
+            'columns_skipped': len(header) - len(df.columns),
+            'seconds': seconds,
+            'file_mb': os.path.getsize(self.csv_path) / 1e6,
+            'memory_mb': memory / 1e6,
+            'untyped_memory_mb': untyped / 1e6,
+            'source': source,
+        }
+    
+    def format_load_report(self):
+        """Format the load report for display"""
+        r = self.load_report
+        if not r:
+            return "No data loaded"
+        text = (
+            f"Loaded {r['rows']:,} rows ({r['columns_loaded']} columns, {r['columns_skipped']} skipped) "
+            f"from {r['file_mb']:.1f} MB in {r['seconds']:.2f}s [{r['source']}]\n"
+            f"Memory: {r['memory_mb']:.1f} MB"
+        )
+        if 'untyped_memory_mb' in r:
+            text += f" (untyped estimate: {r['untyped_memory_mb']:.1f} MB)"
+        if self.shared_columns is not None:
+            text += f"\nPartitions: {self.partition_pool.workers} worker processes, {self.shared_columns.nbytes / 1e6:.1f} MB shared"
+        return text
+    
+    def build_indexes(self):
+        """Build query indexes for the loaded data"""
+        data = self.stream_summary if self.streaming else self.df
+        self.bitmap_index, self.range_indexes, self.range_index_errors, self.summary_cube = self.make_indexes(data)
+        self.file_indexes = {path: self.make_indexes(summary) for path, summary in self.file_summaries.items()}
+        self.approx_summary = self.make_approx_summary(data)
+        self.shared_columns = self.make_shared_columns(self.df, self.bitmap_index)
+        self.bump_data_version()
+    
+    def make_shared_columns(self, df, bitmap_index):
+        """SharedColumns of a frame for the partition pool, if there is one"""
+        if self.partition_pool is None or df is None:
+            return None
+        return SharedColumns(df, bitmap_index)
+    
+    def approx_sample_size(self):
+        """Rows per stratum to sample while loading (None outside approximate mode)"""
+        return self.sample_per_stratum if self.approximate else None
+    
+    def make_approx_summary(self, data):
+        """ApproximateSummary of a frame or StreamingSummary, if approximate mode is on"""
+        if not self.approximate:
+            return None
+        if isinstance(data, StreamingSummary):
+            return data.approx
+        return ApproximateSummary.from_frame(data, self.sample_per_stratum)
+    
+    def set_approximate(self, on):
+        """Switch between approximate and exact answers; returns a status message"""
+        if not on:
+            self.approximate = False
+            return "Exact answers"
+        
+        with self.data_lock:
+            if self.approx_summary is None:
+                if self.df is None:
+                    return "Approximate mode needs --approximate at startup when the data is streamed"
+                self.approximate = True
+                self.approx_summary = self.make_approx_summary(self.df)
+            self.approximate = True
+        return f"Approximate answers from a sample of {self.approx_summary.sample_rows():,} rows"
+    
+    def bump_data_version(self):
+        """Mark the data as changed so cached answers are no longer used"""
+        self.data_version += 1
+        self.result_cache.clear()
+    
+    def make_indexes(self, df):
+        """Build the bitmap index, range indexes and summary cube for a frame
+        A StreamingSummary already answers counts and provides the rest.
+        """
+        if isinstance(df, StreamingSummary):
+            return (df, *df.range_indexes(), df.cube)
+        
+        range_indexes = {}
+        range_index_errors = {}
+        for column in RANGE_COLUMNS:
+            try:
+                range_indexes[column] = SortedRangeIndex(df[column])
+            except Exception as e:
+                # Raised again when a question needs this column
+                range_index_errors[column] = e
+        
+        return BitmapIndex(df), range_indexes, range_index_errors, SummaryCube.from_frame(df)
+    
+    def get_range_index(self, column):
+        """Get the sorted range index for a numeric column"""
+        if column in self.range_index_errors:
+            raise self.range_index_errors[column]
+        return self.range_indexes[column]
+    
+    def check_for_changes(self):
+        """Pick up changes to csv_path
+        Appended rows are parsed on their own and merged into the frame and
+        indexes; any other change (or any change in streaming mode) reloads
+        everything. The new data is built
+        aside and swapped in at once, so questions keep getting answers from
+        the previous data meanwhile. Returns 'append', 'reload' or None.
+        """
         try:
-            if not os.path.exists(self.csv_path):
-                print(f"Error: File '{self.csv_path}' not found!")
-                sys.exit(1)
+            stat = os.stat(self.csv_path)
+            if stat.st_size == self.source_state['size'] and stat.st_mtime_ns == self.source_state['mtime_ns']:
+                return None
+            
+            appended = None if self.streaming else read_appended_rows(self.csv_path, self.source_state)
+            if appended is not None and not appended[0]:
+                # Only part of a line so far: wait for the rest
+                return None
+            if appended is not None:
+                try:
+                    self.apply_append(*appended)
+                    return 'append'
+                except Exception as e:
+                    print(f"Warning: could not merge the rows appended to '{self.csv_path}' ({e}), reloading it")
+            
+            if stat.st_size == self.source_state['size'] and file_digest(self.csv_path) == self.source_state['sha1']:
+                # Touched, not changed
+                self.source_state = dict(self.source_state, mtime_ns=stat.st_mtime_ns)
+                return None
+            
+            if self.streaming:
+                header, summary, state, report = self.read_stream()
+                df, indexes = None, self.make_indexes(summary)
+            else:
+                header, df, state, report = self.read_source()
+                summary, indexes = None, self.make_indexes(df)
+            approx_summary = self.make_approx_summary(summary if self.streaming else df)
+            shared_columns = self.make_shared_columns(df, indexes[0])
             
-            self.df = pd.read_csv(self.csv_path)
+            with self.data_lock:
+                self.header, self.df, self.stream_summary = header, df, summary
+                self.source_state, self.load_report = state, report
+                self.bitmap_index, self.range_indexes, self.range_index_errors, self.summary_cube = indexes
+                self.approx_summary = approx_summary
+                self.shared_columns = shared_columns
+                self.bump_data_version()
+            return 'reload'
             
         except Exception as e:
-            print(f"Error loading CSV: {e}")
-            sys.exit(1)
+            print(f"Warning: could not reload '{self.csv_path}', still using previous data ({e})")
+            return None
+    
+    def apply_append(self, tail_bytes, state):
+        """Merge rows appended to csv_path into the frame and indexes"""
+        start = time.perf_counter()
+        tail = self.read_csv_typed(self.header, io.BytesIO(tail_bytes), header=None, names=list(self.header))
+        
+        df = append_frame(self.df, tail)
+        bitmap_index = self.bitmap_index.extended(tail)
+        summary_cube = self.summary_cube.extended(tail)
+        approx_summary = self.approx_summary.extended(tail) if self.approx_summary is not None else None
+        range_indexes = {
+            column: index.extended(tail[column])
+            for column, index in self.range_indexes.items()
+        }
+        shared_columns = self.make_shared_columns(df, bitmap_index)
+        report = dict(
+            self.build_load_report(df, self.header, time.perf_counter() - start, 'append'),
+            appended_rows=len(tail)
+        )
+        
+        with self.data_lock:
+            self.df, self.source_state, self.load_report = df, state, report
+            self.bitmap_index, self.range_indexes = bitmap_index, range_indexes
+            self.summary_cube = summary_cube
+            self.approx_summary = approx_summary
+            self.shared_columns = shared_columns
+            self.bump_data_version()
+        
+        self.save_snapshot(df, state)
+    
+    def start_watching(self, interval=5.0):
+        """Check csv_path for changes every interval seconds in the background"""
+        if self.csv_paths is not None:
+            print("Warning: watch mode supports a single CSV, not several files")
+            return
+        if self.watch_thread is not None:
+            return
+        
+        self.watch_stop = threading.Event()
+        
+        def watch():
+            while not self.watch_stop.wait(interval):
+                change = self.check_for_changes()
+                if change:
+                    print(f"\n[{change}] {self.format_load_report()}")
+        
+        self.watch_thread = threading.Thread(target=watch, name="csv-watch", daemon=True)
+        self.watch_thread.start()
+    
+    def stop_watching(self):
+        """Stop the background watch started by start_watching"""
+        if self.watch_thread is None:
+            return
+        self.watch_stop.set()
+        self.watch_thread.join()
+        self.watch_thread = None
     
     def init_tts(self):
         """Initialize text-to-speech"""
+        self.tts_started = True
+        if self.async_speech:
+            cache = None
+            if self.speech_cache_dir:
+                try:
+                    cache = SpeechCache(self.speech_cache_dir, self.speech_cache_mb * 1000 * 1000)
+                except OSError as e:
+                    print(f"Warning: speech cache unavailable ({e})")
+            self.speech = SpeechWorker(rate=165, cache=cache)
+            return
+        
+        start = time.perf_counter()
         try:
+            import pyttsx3
             self.engine = pyttsx3.init()
             self.engine.setProperty("rate", 165)
         except:
             self.engine = None
+        self.startup_timings['tts'] = time.perf_counter() - start
     
     def speak(self, text):
         """Speak text"""
+        if not self.voice:
+            return
+        first = not self.tts_started
+        if first:
+            self.init_tts()
+        
+        if self.speech:
+            self.speech.say(text)
+            if first:
+                self.prerender_speech()
+            return
+        
         if self.engine:
             try:
                 self.engine.say(text)
@@ -43,76 +2424,138 @@ class StudentQueryBot:
             except:
                 pass
     
+    def common_phrases(self):
+        """Speech texts worth rendering ahead: the count answers for the
+        loaded data and the fixed messages
+        """
+        phrases = ["Goodbye!"]
+        for intent in list(COUNT_INTENTS) + list(RANGE_INTENTS) + ["UNKNOWN"]:
+            response = self.answer_intent(intent, ())
+            phrases.append(response['speech'] if isinstance(response, dict) else response)
+        return phrases
+    
+    def prerender_speech(self):
+        """Render common phrases in the background once the voice engine is up
+        Called after the first answer is spoken, so startup doesn't pay for it.
+        """
+        if not self.voice or not self.async_speech or not self.speech_cache_dir:
+            return
+        if self.speech:
+            with self.data_lock:
+                phrases = self.common_phrases()
+            self.speech.prerender(phrases)
+    
+    def format_startup_report(self):
+        """Startup time per stage: imports, data load, index build and TTS"""
+        timings = self.startup_timings
+        if not self.voice:
+            tts = "off"
+        elif self.speech and self.speech.init_seconds is not None:
+            tts = f"{self.speech.init_seconds * 1000:.0f} ms (background)"
+        elif 'tts' in timings:
+            tts = f"{timings['tts'] * 1000:.0f} ms"
+        else:
+            tts = "deferred until first answer"
+        
+        stages = [timings.get(stage, 0.0) for stage in ('imports', 'data_load', 'index_build')]
+        return (
+            f"Startup: imports {stages[0] * 1000:.0f} ms, data load {stages[1] * 1000:.0f} ms, "
+            f"index build {stages[2] * 1000:.0f} ms (total {sum(stages) * 1000:.0f} ms), TTS {tts}"
+        )
+    
+    def record_turn(self, compute_seconds, speech_wait_seconds):
+        """Remember how long a REPL turn spent computing and waiting on speech"""
+        self.turn_timings.append({'compute': compute_seconds, 'speech_wait': speech_wait_seconds})
+    
+    def format_turn_timing(self):
+        """Summarize time per turn spent on computation versus speech"""
+        if not self.turn_timings:
+            return "No questions answered yet"
+        
+        turns = len(self.turn_timings)
+        compute = sum(t['compute'] for t in self.turn_timings) / turns
+        speech_wait = sum(t['speech_wait'] for t in self.turn_timings) / turns
+        text = (
+            f"Turns: {turns}, avg compute {compute * 1000:.1f} ms, "
+            f"avg wait on speech {speech_wait * 1000:.1f} ms "
+            f"({'background' if self.speech else 'blocking'} speech)"
+        )
+        if self.speech and self.speech.utterances:
+            text += f"\nSpoken in background: {self.speech.utterances} answers, {self.speech.speech_seconds:.1f}s"
+        if self.speech and self.speech.cache is not None:
+            text += f"\n{self.speech.cache.format()}"
+            if self.speech.player is None:
+                text += " (no audio player found, so clips are not used)"
+        return text
+    
     def extract_number(self, text):
         """Extract number from text"""
-        import re
-        numbers = re.findall(r'\d+', text)
-        return int(numbers[0]) if numbers else None
+        numbers = self.parse_question(text)[1]
+        return numbers[0] if numbers else None
+    
+    def parse_question(self, question):
+        """Detect the intent and the numbers in a question (memoized)"""
+        return match_question(question.lower().strip())
     
     def detect_intent(self, question):
         """Detect what user is asking"""
-        q = question.lower().strip()
-        
-        # DISCOUNT queries with numeric conditions (check very early)
-        if any(word in q for word in ["more than", "greater than", "above", "zyada", "jyada"]) and any(word in q for word in ["discount", "concession", "chhoot"]):
-            return "DISCOUNT_MORE_THAN"
-        
-        if any(word in q for word in ["less than", "below", "under", "kam", "niche"]) and any(word in q for word in ["discount", "concession", "chhoot"]):
-            return "DISCOUNT_LESS_THAN"
-        
-        if "between" in q and any(word in q for word in ["discount", "concession", "chhoot"]):
-            return "DISCOUNT_BETWEEN"
-        
-        if any(word in q for word in ["more than", "greater than", "above", "zyada", "jyada"]) and any(word in q for word in ["paid", "fees", "fee", "payment"]):
-            return "FEES_MORE_THAN"
-        
-        if any(word in q for word in ["less than", "below", "under", "kam", "niche"]) and any(word in q for word in ["paid", "fees", "fee", "payment"]):
-            return "FEES_LESS_THAN"
-        
-        if "between" in q and any(word in q for word in ["paid", "fees", "fee", "payment"]):
-            return "FEES_BETWEEN"
-        
-        # ELIGIBLE queries (check early - specific)
-        if any(word in q for word in ["not eligible", "ineligible", "eligible nahi"]):
-            return "NOT_ELIGIBLE"
-        
-        if any(word in q for word in ["eligible", "eligibility"]):
-            return "ELIGIBLE"
-        
-        # BATCH queries (check early)
-        if any(word in q for word in ["no batch", "without batch", "batch nahi"]):
-            return "NO_BATCH"
-        
-        if any(word in q for word in ["with batch", "batch assigned", "batch mila", "have batch"]):
-            return "WITH_BATCH"
-        
-        # ADMISSION CANCELLED queries (check first - most specific)
-        if any(word in q for word in ["cancelled", "cancel"]) and any(word in q for word in ["admission", "admitted"]):
-            return "ADMISSION_CANCELLED"
-        
-        # ADMISSION queries (check before registration)
-        if any(word in q for word in ["admission", "admitted"]):
-            return "ADMISSION"
-        
-        # REGISTRATION queries
-        if any(word in q for word in ["registration", "registered", "total", "student", "count", "how many", "kitne"]):
-            return "REGISTRATION"
+        return self.parse_question(question)[0]
+    
+    def classify_unmatched(self, questions, block=False):
+        """Ask the intent model about questions the keyword rules missed
+        All questions not seen before go to the model in one batch; results
+        are remembered by normalized text. block waits for the model to
+        load; otherwise they are UNKNOWN (and not remembered) until it has.
+        """
+        if self.intent_model is None:
+            return ["UNKNOWN" for _ in questions]
         
-        return "UNKNOWN"
+        texts = [question.lower().strip() for question in questions]
+        new_texts = sorted({text for text in texts if text not in self.model_intents})
+        if new_texts:
+            if len(self.model_intents) > 4096:
+                self.model_intents.clear()
+            predictions = self.intent_model.predict(new_texts, block)
+            if predictions is None:
+                return ["UNKNOWN" if text in new_texts else self.model_intents[text] for text in texts]
+            for text, (intent, confidence) in zip(new_texts, predictions):
+                self.model_intents[text] = intent
+        return [self.model_intents[text] for text in texts]
+    
+    def resolve_intent(self, question):
+        """Intent and numbers: keyword rules first, then the intent model"""
+        intent, numbers = self.parse_question(question)
+        if intent == "UNKNOWN":
+            intent = self.classify_unmatched([question])[0]
+        return intent, numbers
+    
+    def parse_breakdown(self, question):
+        """Split "admissions per batch" into the base question and the column
+        Returns (question, column); column is None when no breakdown is asked.
+        """
+        text = question.lower().strip()
+        match = BREAKDOWN_PATTERN.search(text)
+        if not match:
+            return question, None
+        column = BREAKDOWN_DIMENSIONS[match.group(1) or match.group(2)]
+        return (text[:match.start()] + text[match.end():]).strip(), column
+    
+    def get_breakdown(self, intent, column):
+        """Count the students of a count intent per value of a column"""
+        try:
+            return self.summary_cube.breakdown(column, *COUNT_INTENTS[intent][1])
+            
+        except KeyError as e:
+            return f"Error: Column {e} not found in data"
+        except Exception as e:
+            return f"Error: {e}"
     
     def get_registration_students(self):
         """Get students who are actually registered
         Criteria: fees_paid > 3499 AND status = 'Active' AND free_admission = False
         """
         try:
-            conditions = (
-                (self.df['fees_paid'] > 3499) &
-                (self.df['status'] == 'Active') &
-                (self.df['free_admission'] == False)
-            )
-            
-            filtered_df = self.df[conditions]
-            return len(filtered_df)
+            return self.summary_cube.count(*COUNT_INTENTS['REGISTRATION'][1])
             
         except KeyError as e:
             return f"Error: Column {e} not found in data"
@@ -124,15 +2567,7 @@ class StudentQueryBot:
         Criteria: Registration criteria + ay26_enrollment_status contains 'Admission'
         """
         try:
-            conditions = (
-                (self.df['fees_paid'] > 3499) &
-                (self.df['status'] == 'Active') &
-                (self.df['free_admission'] == False) &
-                (self.df['ay26_enrollment_status'].str.contains('Admission', case=False, na=False))
-            )
-            
-            filtered_df = self.df[conditions]
-            return len(filtered_df)
+            return self.summary_cube.count(*COUNT_INTENTS['ADMISSION'][1])
             
         except KeyError as e:
             return f"Error: Column {e} not found in data"
@@ -144,12 +2579,7 @@ class StudentQueryBot:
         Criteria: form_status contains 'Admission' (like 'Admission Cancelled', 'Admission Cancel', etc.)
         """
         try:
-            conditions = (
-                self.df['form_status'].str.contains('Admission', case=False, na=False)
-            )
-            
-            filtered_df = self.df[conditions]
-            return len(filtered_df)
+            return self.summary_cube.count(*COUNT_INTENTS['ADMISSION_CANCELLED'][1])
             
         except KeyError as e:
             return f"Error: Column {e} not found in data"
@@ -161,13 +2591,7 @@ class StudentQueryBot:
         Criteria: batch contains 'No Batch' AND ay26_enrollment_status contains 'Admission'
         """
         try:
-            conditions = (
-                (self.df['batch'].str.contains('No Batch', case=False, na=False)) &
-                (self.df['ay26_enrollment_status'].str.contains('Admission', case=False, na=False))
-            )
-            
-            filtered_df = self.df[conditions]
-            return len(filtered_df)
+            return self.summary_cube.count(*COUNT_INTENTS['NO_BATCH'][1])
             
         except KeyError as e:
             return f"Error: Column {e} not found in data"
@@ -179,15 +2603,7 @@ class StudentQueryBot:
         Criteria: batch does NOT contain 'No Batch' AND ay26_enrollment_status contains 'Admission'
         """
         try:
-            conditions = (
-                (~self.df['batch'].str.contains('No Batch', case=False, na=False)) &
-                (self.df['batch'].notna()) &
-                (self.df['batch'] != '') &
-                (self.df['ay26_enrollment_status'].str.contains('Admission', case=False, na=False))
-            )
-            
-            filtered_df = self.df[conditions]
-            return len(filtered_df)
+            return self.summary_cube.count(*COUNT_INTENTS['WITH_BATCH'][1])
             
         except KeyError as e:
             return f"Error: Column {e} not found in data"
@@ -199,15 +2615,7 @@ class StudentQueryBot:
         Criteria: Registration criteria + eligibility_status = 'Eligible'
         """
         try:
-            conditions = (
-                (self.df['fees_paid'] > 3499) &
-                (self.df['status'] == 'Active') &
-                (self.df['free_admission'] == False) &
-                (self.df['eligibility_status'] == 'Eligible')
-            )
-            
-            filtered_df = self.df[conditions]
-            return len(filtered_df)
+            return self.summary_cube.count(*COUNT_INTENTS['ELIGIBLE'][1])
             
         except KeyError as e:
             return f"Error: Column {e} not found in data"
@@ -219,15 +2627,7 @@ class StudentQueryBot:
         Criteria: Registration criteria + eligibility_status != 'Eligible'
         """
         try:
-            conditions = (
-                (self.df['fees_paid'] > 3499) &
-                (self.df['status'] == 'Active') &
-                (self.df['free_admission'] == False) &
-                (self.df['eligibility_status'] != 'Eligible')
-            )
-            
-            filtered_df = self.df[conditions]
-            return len(filtered_df)
+            return self.summary_cube.count(*COUNT_INTENTS['NOT_ELIGIBLE'][1])
             
         except KeyError as e:
             return f"Error: Column {e} not found in data"
@@ -237,18 +2637,7 @@ class StudentQueryBot:
     def get_fees_more_than(self, amount):
         """Get students who paid more than specified amount"""
         try:
-            conditions = (
-                self.df['fees_paid'] > amount
-            )
-            
-            filtered_df = self.df[conditions]
-            count = len(filtered_df)
-            total_amount = filtered_df['fees_paid'].sum()
-            
-            return {
-                'count': count,
-                'total': total_amount
-            }
+            return self.get_range_index('fees_paid').more_than(amount)
             
         except KeyError as e:
             return f"Error: Column {e} not found in data"
@@ -258,18 +2647,7 @@ class StudentQueryBot:
     def get_fees_less_than(self, amount):
         """Get students who paid less than specified amount"""
         try:
-            conditions = (
-                self.df['fees_paid'] < amount
-            )
-            
-            filtered_df = self.df[conditions]
-            count = len(filtered_df)
-            total_amount = filtered_df['fees_paid'].sum()
-            
-            return {
-                'count': count,
-                'total': total_amount
-            }
+            return self.get_range_index('fees_paid').less_than(amount)
             
         except KeyError as e:
             return f"Error: Column {e} not found in data"
@@ -279,19 +2657,7 @@ class StudentQueryBot:
     def get_fees_between(self, min_amount, max_amount):
         """Get students who paid between specified amounts"""
         try:
-            conditions = (
-                (self.df['fees_paid'] >= min_amount) &
-                (self.df['fees_paid'] <= max_amount)
-            )
-            
-            filtered_df = self.df[conditions]
-            count = len(filtered_df)
-            total_amount = filtered_df['fees_paid'].sum()
-            
-            return {
-                'count': count,
-                'total': total_amount
-            }
+            return self.get_range_index('fees_paid').between(min_amount, max_amount)
             
         except KeyError as e:
             return f"Error: Column {e} not found in data"
@@ -301,17 +2667,11 @@ class StudentQueryBot:
     def get_discount_more_than(self, percentage):
         """Get students who got discount more than specified percentage"""
         try:
-            conditions = (
-                self.df['% discount'] > percentage
-            )
-            
-            filtered_df = self.df[conditions]
-            count = len(filtered_df)
-            avg_discount = filtered_df['% discount'].mean()
+            result = self.get_range_index('% discount').more_than(percentage)
             
             return {
-                'count': count,
-                'avg_discount': avg_discount
+                'count': result['count'],
+                'avg_discount': range_mean(result)
             }
             
         except KeyError as e:
@@ -322,17 +2682,11 @@ class StudentQueryBot:
     def get_discount_less_than(self, percentage):
         """Get students who got discount less than specified percentage"""
         try:
-            conditions = (
-                self.df['% discount'] < percentage
-            )
-            
-            filtered_df = self.df[conditions]
-            count = len(filtered_df)
-            avg_discount = filtered_df['% discount'].mean()
+            result = self.get_range_index('% discount').less_than(percentage)
             
             return {
-                'count': count,
-                'avg_discount': avg_discount
+                'count': result['count'],
+                'avg_discount': range_mean(result)
             }
             
         except KeyError as e:
@@ -343,18 +2697,11 @@ class StudentQueryBot:
     def get_discount_between(self, min_percentage, max_percentage):
         """Get students who got discount between specified percentages"""
         try:
-            conditions = (
-                (self.df['% discount'] >= min_percentage) &
-                (self.df['% discount'] <= max_percentage)
-            )
-            
-            filtered_df = self.df[conditions]
-            count = len(filtered_df)
-            avg_discount = filtered_df['% discount'].mean()
+            result = self.get_range_index('% discount').between(min_percentage, max_percentage)
             
             return {
-                'count': count,
-                'avg_discount': avg_discount
+                'count': result['count'],
+                'avg_discount': range_mean(result)
             }
             
         except KeyError as e:
@@ -362,14 +2709,420 @@ class StudentQueryBot:
         except Exception as e:
             return f"Error: {e}"
     
+    def plan_query(self, question):
+        """QueryPlan for a question with two or more conditions, else None"""
+        plan = QueryPlan(*parse_conditions(question.lower().strip()))
+        return plan if len(plan) >= 2 else None
+    
+    def rows_plan(self, question):
+        """QueryPlan selecting the students behind any count, range or
+        compound question; an error string for other questions
+        """
+        plan = self.plan_query(question)
+        if plan is not None:
+            return plan
+        
+        intent, numbers = self.resolve_intent(question)
+        if intent in RANGE_INTENTS and len(numbers) < INTENT_ARITY[intent]:
+            return f"Please give {INTENT_ARITY[intent]} number(s) for that question, e.g. 'list fees more than 5000'"
+        plan = self.intent_plan(intent, numbers)
+        if plan is None:
+            return "I can list students for counts, fees and discount questions, e.g. 'list not eligible students'"
+        return plan
+    
+    def intent_plan(self, intent, numbers):
+        """QueryPlan for a count or range intent (None for others, or
+        when the intent is missing its numbers)
+        """
+        if intent in COUNT_INTENTS:
+            return QueryPlan([intent], [])
+        if intent in RANGE_INTENTS and len(numbers) >= INTENT_ARITY[intent]:
+            column, op = RANGE_INTENTS[intent]
+            return QueryPlan([], [(column, op, tuple(numbers[:INTENT_ARITY[intent]]))])
+        return None
+    
+    def export_columns(self, columns=None):
+        """Output columns: the given ones (checked) or every column of the CSV"""
+        paths = self.csv_paths or [self.csv_path]
+        header = list(pd.read_csv(paths[0], nrows=0).columns)
+        aliases = {file_name: column for column, file_name in queried_columns(header).items()}
+        available = [aliases.get(name, name) for name in header]
+        if columns is None:
+            return available
+        
+        missing = [column for column in columns if column not in available]
+        if missing:
+            raise KeyError(", ".join(missing))
+        return list(columns)
+    
+    def iter_rows(self, question, columns=None, offset=0, limit=None):
+        """Yield frames of the students behind a question, from the CSV
+        Rows are read in chunks of chunksize and never collected into one
+        frame; offset and limit page through the matches.
+        """
+        plan = self.rows_plan(question)
+        if isinstance(plan, str):
+            raise ValueError(plan)
+        
+        skip, remaining = offset, limit
+        for rows in iter_matching_rows(self.csv_paths or [self.csv_path], plan, self.export_columns(columns), self.chunksize):
+            if skip:
+                rows, skip = rows.iloc[skip:], max(0, skip - len(rows))
+            if remaining is not None:
+                rows = rows.iloc[:remaining]
+                remaining -= len(rows)
+            if len(rows):
+                yield rows
+            if remaining == 0:
+                return
+    
+    def export_rows(self, question, output, fmt=None, columns=None, offset=0, limit=None):
+        """Write the students behind a question to CSV or JSONL
+        output is a path or a text file; fmt is 'csv' or 'jsonl' (default:
+        from the file extension, else csv). Returns the number of rows
+        written, or an error message.
+        """
+        if fmt is None:
+            name = output if isinstance(output, str) else getattr(output, 'name', '')
+            fmt = 'jsonl' if str(name).lower().endswith(('.jsonl', '.json')) else 'csv'
+        
+        try:
+            if isinstance(output, str):
+                with open(output, "w", encoding="utf-8", newline="") as f:
+                    return self.export_rows(question, f, fmt, columns, offset, limit)
+            
+            written = 0
+            for rows in self.iter_rows(question, columns, offset, limit):
+                if fmt == 'jsonl':
+                    output.write(rows.to_json(orient='records', lines=True, force_ascii=False).rstrip("\n") + "\n")
+                else:
+                    rows.to_csv(output, header=(written == 0), index=False)
+                written += len(rows)
+            if written == 0 and fmt == 'csv':
+                output.write(",".join(self.export_columns(columns)) + "\n")
+            return written
+            
+        except KeyError as e:
+            return f"Error: Column {e} not found in data"
+        except Exception as e:
+            return f"Error: {e}"
+    
+    def format_rows_page(self, question, page=1, page_size=20, columns=None):
+        """One page of the students behind a question, as a text table"""
+        try:
+            frames = list(self.iter_rows(question, columns, (page - 1) * page_size, page_size))
+        except KeyError as e:
+            return f"Error: Column {e} not found in data"
+        except Exception as e:
+            return f"Error: {e}"
+        
+        if not frames:
+            return "No more students" if page > 1 else "No students match"
+        rows = pd.concat(frames)
+        first = (page - 1) * page_size + 1
+        return (
+            f"Students {first}-{first + len(rows) - 1} (page {page}):\n"
+            f"{rows.to_string(index=False)}\n"
+            f"(Type 'more' for the next page)"
+        )
+    
+    def get_compound(self, plan):
+        """Count students meeting every condition of a plan
+        The bitmap predicates are ANDed first, word by word. Range conditions
+        are then ordered by estimated selectivity (from the range indexes)
+        and each one only looks at the rows still matching, so the data is
+        passed over once and later conditions see fewer and fewer rows.
+        With a partition pool the same steps run on every partition in
+        parallel. Without the rows in memory (streaming or multi-file mode)
+        only predicates can be counted, from the summary cube, and the total
+        is None.
+        """
+        try:
+            if self.df is None:
+                if plan.ranges:
+                    return "Error: Range conditions in compound questions need the data in memory (not available in streaming or multi-file mode)"
+                n_rows = int(self.summary_cube.cells['count'].sum())
+                count = self.summary_cube.count(*plan.predicates)
+                steps = [(" + ".join(plan.describe()), count / n_rows if n_rows else 0.0)]
+                return {'count': count, 'total': None, 'avg_discount': float('nan'), 'steps': steps}
+            
+            n_rows = len(self.df)
+            estimates = []
+            for column, op, bounds in plan.ranges:
+                index = self.get_range_index(column)
+                matched = getattr(index, op + '_than' if op != 'between' else op)(*bounds)['count']
+                estimates.append((matched / n_rows if n_rows else 0.0, (column, op, bounds)))
+            estimates.sort(key=lambda item: item[0])
+            
+            if self.shared_columns is not None:
+                ranges = [condition for selectivity, condition in estimates]
+                result = self.partition_pool.evaluate(self.shared_columns, plan.predicates, ranges)
+                steps = [(describe_range(*condition), selectivity) for selectivity, condition in estimates]
+                if plan.predicates:
+                    matched = self.summary_cube.count(*plan.predicates)
+                    steps.insert(0, (" + ".join(plan.describe()[:len(plan.intents)]), matched / n_rows if n_rows else 0.0))
+                return dict(result, steps=steps)
+            
+            steps = []
+            if plan.predicates:
+                bits = self.bitmap_index.combine(*plan.predicates)
+                rows = np.flatnonzero(np.unpackbits(bits, count=n_rows))
+                steps.append((" + ".join(plan.describe()[:len(plan.intents)]), len(rows) / n_rows if n_rows else 0.0))
+            else:
+                rows = None  # every row
+            
+            for selectivity, (column, op, bounds) in estimates:
+                values = self.df[column].to_numpy(dtype=float, na_value=np.nan)
+                if rows is None:
+                    rows = np.flatnonzero(range_condition_mask(values, op, bounds))
+                else:
+                    rows = rows[range_condition_mask(values[rows], op, bounds)]
+                steps.append((describe_range(column, op, bounds), selectivity))
+            
+            fees = self.df['fees_paid'].to_numpy(dtype=float, na_value=np.nan)[rows] if 'fees_paid' in self.df.columns else np.zeros(0)
+            discounts = self.df['% discount'].to_numpy(dtype=float, na_value=np.nan)[rows] if '% discount' in self.df.columns else np.zeros(0)
+            return {
+                'count': len(rows),
+                'total': float(np.nansum(fees)),
+                'avg_discount': float(np.nanmean(discounts)) if np.isfinite(discounts).any() else float('nan'),
+                'steps': steps,
+            }
+            
+        except KeyError as e:
+            return f"Error: Column {e} not found in data"
+        except Exception as e:
+            return f"Error: {e}"
+    
+    def run_query(self, method, *args):
+        """Call a get_* method, reusing its result within an answer_many batch"""
+        start = time.perf_counter()
+        try:
+            if self.batch_memo is None:
+                return method(*args)
+            
+            key = (method.__name__, args)
+            if key not in self.batch_memo:
+                self.batch_memo[key] = method(*args)
+            return self.batch_memo[key]
+        finally:
+            self.add_stage('filter', start)
+    
     def answer(self, question):
         """Answer the question"""
+        # Hold off data swaps from the watcher until this answer is built
+        with self.data_lock:
+            return self.build_answer(question)
+    
+    def answer_by_file(self, question):
+        """Answer a question for each file separately, plus combined
+        Returns {path: answer, ..., 'combined': answer}; with a single CSV
+        only 'combined' is present.
+        """
+        results = {}
+        with self.data_lock:
+            combined = (self.bitmap_index, self.range_indexes, self.range_index_errors, self.summary_cube)
+            approx_summary = self.approx_summary
+            try:
+                for path, indexes in self.file_indexes.items():
+                    self.bitmap_index, self.range_indexes, self.range_index_errors, self.summary_cube = indexes
+                    self.approx_summary = self.file_summaries[path].approx
+                    self.cache_scope = path
+                    results[path] = self.build_answer(question)
+            finally:
+                self.bitmap_index, self.range_indexes, self.range_index_errors, self.summary_cube = combined
+                self.approx_summary = approx_summary
+                self.cache_scope = None
+            results['combined'] = self.build_answer(question)
+        return results
+    
+    def format_answer_by_file(self, question):
+        """Per-file answers as display text"""
+        lines = []
+        for name, response in self.answer_by_file(question).items():
+            text = response['display'] if isinstance(response, dict) else response
+            lines.append(f"[{os.path.basename(name)}] {text}")
+        return "\n".join(lines)
+    
+    def answer_many(self, questions, intents=None):
+        """Answer a batch of questions against one version of the data
+        Questions that resolve to the same query are computed once. When
+        intents is a list, the intent each answer was built for is appended.
+        """
+        # Questions no rule matches go to the intent model in one batch,
+        # waiting for it to load: batches aren't interactive
+        unmatched = [question for question in questions if self.detect_intent(question) == "UNKNOWN"]
+        self.classify_unmatched(unmatched, block=True)
+        
+        with self.data_lock:
+            self.batch_memo = {}
+            try:
+                responses = []
+                for question in questions:
+                    responses.append(self.build_answer(question))
+                    if intents is not None:
+                        intents.append(self.trace.intent)
+                return responses
+            finally:
+                self.batch_memo = None
+    
+    def answer_jsonl(self, input_file, output_file):
+        """Answer questions read as JSONL, writing one JSON answer per line
+        Each line is a JSON string or an object with a "question" field;
+        other fields (like an id) are copied to the answer. A line that isn't
+        valid JSON gets {"line": n, "error": ...} in its place.
+        """
+        records = []
+        for number, line in enumerate(input_file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                records.append(({'line': number}, f"invalid JSON: {e}"))
+                continue
+            records.append((record if isinstance(record, dict) else {'question': record}, None))
+        
+        questions = [str(record.get('question', '')) for record, error in records if error is None]
+        intents = []
+        answers = iter(zip(self.answer_many(questions, intents), intents))
+        
+        for record, error in records:
+            if error is not None:
+                result = dict(record, error=error)
+            else:
+                response, intent = next(answers)
+                result = dict(record, intent=intent)
+                if isinstance(response, dict):
+                    result.update(response)
+                else:
+                    result.update(display=response, speech=response)
+            output_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        
+        return len(records)
+    
+    def add_stage(self, stage, start):
+        """Add the time since start to a stage of the answer being built"""
+        stages = getattr(self.trace, 'stages', None)
+        if stages is not None:
+            stages[stage] = stages.get(stage, 0.0) + time.perf_counter() - start
+    
+    def build_answer(self, question):
+        """Work out the answer for a question, timing each stage
+        parse is intent and number detection, filter the get_* queries and
+        format everything else; all are recorded per intent in latency.
+        """
+        self.trace.stages = {}
+        self.trace.intent = "UNKNOWN"
+        self.trace.params = ()
+        self.trace.cached = False
+        profiler = None
+        if self.profile_slow is not None:
+            import cProfile
+            profiler = cProfile.Profile()
+        
+        start = time.perf_counter()
+        if profiler:
+            response = profiler.runcall(self.compute_answer, question)
+        else:
+            response = self.compute_answer(question)
+        total = time.perf_counter() - start
+        
+        stages, self.trace.stages = self.trace.stages, None
+        stages['format'] = max(0.0, total - sum(stages.values()))
+        stages['total'] = total
+        self.latency.record(self.trace.intent, stages)
+        if self.query_log is not None and self.cache_scope is None:
+            self.query_log.write(question, self.trace.intent, self.trace.params, self.trace.cached, stages)
+        
+        if profiler and total >= self.profile_slow and (self.slow_profile is None or total > self.slow_profile['seconds']):
+            self.slow_profile = {'question': question, 'seconds': total, 'report': self.format_profile(profiler)}
+        return response
+    
+    def format_profile(self, profiler, limit=15):
+        """Top functions of a cProfile run by cumulative time"""
+        import pstats
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(limit)
+        return output.getvalue()
+    
+    def profile_question(self, question, limit=15):
+        """Answer one question under cProfile and return the report"""
+        import cProfile
+        profiler = cProfile.Profile()
+        with self.data_lock:
+            # Only one profiler can run at a time, so skip the profile_slow one
+            profile_slow, self.profile_slow = self.profile_slow, None
+            try:
+                profiler.runcall(self.build_answer, question)
+            finally:
+                self.profile_slow = profile_slow
+        return self.format_profile(profiler, limit)
+    
+    def parse_timed(self, question):
+        """resolve_intent, timed as the parse stage"""
+        start = time.perf_counter()
+        try:
+            return self.resolve_intent(question)
+        finally:
+            self.add_stage('parse', start)
+    
+    def compute_answer(self, question):
+        """Work out the answer for a question"""
         try:
-            intent = self.detect_intent(question)
-            print(f"DEBUG: Detected intent = {intent}")
+            start = time.perf_counter()
+            base_question, breakdown_column = self.parse_breakdown(question)
+            self.add_stage('parse', start)
+            if breakdown_column is not None:
+                base_intent = self.parse_timed(base_question)[0]
+                if base_intent in COUNT_INTENTS:
+                    self.trace.intent = f"{base_intent} by {breakdown_column}"
+                    self.trace.params = (breakdown_column,)
+                    return self.cached_answer((base_intent, breakdown_column), self.build_breakdown_answer, base_intent, breakdown_column)
             
+            start = time.perf_counter()
+            plan = self.plan_query(question)
+            self.add_stage('parse', start)
+            if plan is not None and plan.ranges and self.df is None and not self.approximate:
+                # Range conditions need the rows: answer the main intent alone
+                plan = None
+            if plan is not None:
+                self.trace.intent = "COMPOUND"
+                self.trace.params = plan.describe()
+                if self.approximate:
+                    return self.cached_answer(plan.key() + ('approximate',), self.build_approximate_answer, plan)
+                return self.cached_answer(plan.key(), self.build_compound_answer, plan)
+            
+            intent, numbers = self.parse_timed(question)
+            self.trace.intent = intent
+            self.trace.params = numbers[:INTENT_ARITY.get(intent, 0)]
+            
+            plan = self.intent_plan(intent, numbers) if self.approximate else None
+            if plan is not None:
+                return self.cached_answer(plan.key() + ('approximate',), self.build_approximate_answer, plan)
+            
+            # Phrasings with the same intent and numbers share one cache entry
+            key = (intent, numbers[:INTENT_ARITY.get(intent, 0)])
+            return self.cached_answer(key, self.answer_intent, intent, numbers)
+            
+        except Exception as e:
+            return f"Error: {e}"
+    
+    def cached_answer(self, key, method, *args):
+        """method(*args), through the result cache under key and the data version"""
+        key = (self.data_version, self.cache_scope) + key
+        found, response = self.result_cache.get(key)
+        self.trace.cached = found
+        if not found:
+            response = method(*args)
+            self.result_cache.put(key, response)
+        return dict(response) if isinstance(response, dict) else response
+    
+    def answer_intent(self, intent, numbers):
+        """Work out the answer for a detected intent and its numbers"""
+        try:
             if intent == "REGISTRATION":
-                count = self.get_registration_students()
+                count = self.run_query(self.get_registration_students)
                 
                 if isinstance(count, str):  # Error message
                     return count
@@ -381,7 +3134,7 @@ class StudentQueryBot:
                 return {"display": display_text, "speech": speech_text}
             
             if intent == "ADMISSION":
-                count = self.get_admission_students()
+                count = self.run_query(self.get_admission_students)
                 
                 if isinstance(count, str):  # Error message
                     return count
@@ -393,7 +3146,7 @@ class StudentQueryBot:
                 return {"display": display_text, "speech": speech_text}
             
             if intent == "ADMISSION_CANCELLED":
-                count = self.get_admission_cancelled_students()
+                count = self.run_query(self.get_admission_cancelled_students)
                 
                 if isinstance(count, str):  # Error message
                     return count
@@ -405,7 +3158,7 @@ class StudentQueryBot:
                 return {"display": display_text, "speech": speech_text}
             
             if intent == "NO_BATCH":
-                count = self.get_no_batch_students()
+                count = self.run_query(self.get_no_batch_students)
                 
                 if isinstance(count, str):  # Error message
                     return count
@@ -417,7 +3170,7 @@ class StudentQueryBot:
                 return {"display": display_text, "speech": speech_text}
             
             if intent == "WITH_BATCH":
-                count = self.get_with_batch_students()
+                count = self.run_query(self.get_with_batch_students)
                 
                 if isinstance(count, str):  # Error message
                     return count
@@ -429,7 +3182,7 @@ class StudentQueryBot:
                 return {"display": display_text, "speech": speech_text}
             
             if intent == "ELIGIBLE":
-                count = self.get_eligible_students()
+                count = self.run_query(self.get_eligible_students)
                 
                 if isinstance(count, str):  # Error message
                     return count
@@ -441,7 +3194,7 @@ class StudentQueryBot:
                 return {"display": display_text, "speech": speech_text}
             
             if intent == "NOT_ELIGIBLE":
-                count = self.get_not_eligible_students()
+                count = self.run_query(self.get_not_eligible_students)
                 
                 if isinstance(count, str):  # Error message
                     return count
@@ -453,12 +3206,12 @@ class StudentQueryBot:
                 return {"display": display_text, "speech": speech_text}
             
             if intent == "FEES_MORE_THAN":
-                amount = self.extract_number(question)
+                amount = numbers[0] if numbers else None
                 
                 if not amount:
                     return "Please specify an amount. Example: 'students who paid more than 5000'"
                 
-                result = self.get_fees_more_than(amount)
+                result = self.run_query(self.get_fees_more_than, amount)
                 
                 if isinstance(result, str):  # Error message
                     return result
@@ -470,12 +3223,12 @@ class StudentQueryBot:
                 return {"display": display_text, "speech": speech_text}
             
             if intent == "FEES_LESS_THAN":
-                amount = self.extract_number(question)
+                amount = numbers[0] if numbers else None
                 
                 if not amount:
                     return "Please specify an amount. Example: 'students who paid less than 2000'"
                 
-                result = self.get_fees_less_than(amount)
+                result = self.run_query(self.get_fees_less_than, amount)
                 
                 if isinstance(result, str):  # Error message
                     return result
@@ -487,16 +3240,12 @@ class StudentQueryBot:
                 return {"display": display_text, "speech": speech_text}
             
             if intent == "FEES_BETWEEN":
-                import re
-                numbers = re.findall(r'\d+', question)
-                
                 if len(numbers) < 2:
                     return "Please specify two amounts. Example: 'students who paid between 5000 and 10000'"
                 
-                min_amount = int(numbers[0])
-                max_amount = int(numbers[1])
+                min_amount, max_amount = numbers[0], numbers[1]
                 
-                result = self.get_fees_between(min_amount, max_amount)
+                result = self.run_query(self.get_fees_between, min_amount, max_amount)
                 
                 if isinstance(result, str):  # Error message
                     return result
@@ -508,12 +3257,12 @@ class StudentQueryBot:
                 return {"display": display_text, "speech": speech_text}
             
             if intent == "DISCOUNT_MORE_THAN":
-                percentage = self.extract_number(question)
+                percentage = numbers[0] if numbers else None
                 
                 if not percentage:
                     return "Please specify a percentage. Example: 'students who got discount more than 50'"
                 
-                result = self.get_discount_more_than(percentage)
+                result = self.run_query(self.get_discount_more_than, percentage)
                 
                 if isinstance(result, str):  # Error message
                     return result
@@ -525,12 +3274,12 @@ class StudentQueryBot:
                 return {"display": display_text, "speech": speech_text}
             
             if intent == "DISCOUNT_LESS_THAN":
-                percentage = self.extract_number(question)
+                percentage = numbers[0] if numbers else None
                 
                 if not percentage:
                     return "Please specify a percentage. Example: 'students who got discount less than 30'"
                 
-                result = self.get_discount_less_than(percentage)
+                result = self.run_query(self.get_discount_less_than, percentage)
                 
                 if isinstance(result, str):  # Error message
                     return result
@@ -542,16 +3291,12 @@ class StudentQueryBot:
                 return {"display": display_text, "speech": speech_text}
             
             if intent == "DISCOUNT_BETWEEN":
-                import re
-                numbers = re.findall(r'\d+', question)
-                
                 if len(numbers) < 2:
                     return "Please specify two percentages. Example: 'discount between 20 and 50'"
                 
-                min_percentage = int(numbers[0])
-                max_percentage = int(numbers[1])
+                min_percentage, max_percentage = numbers[0], numbers[1]
                 
-                result = self.get_discount_between(min_percentage, max_percentage)
+                result = self.run_query(self.get_discount_between, min_percentage, max_percentage)
                 
                 if isinstance(result, str):  # Error message
                     return result
@@ -568,12 +3313,102 @@ class StudentQueryBot:
         except Exception as e:
             return f"Error: {e}"
     
+    def get_approximate(self, plan):
+        """Estimate a QueryPlan from the approximate summary"""
+        try:
+            return self.approx_summary.estimate(plan)
+            
+        except KeyError as e:
+            return f"Error: Column {e} not found in data"
+        except Exception as e:
+            return f"Error: {e}"
+    
+    def build_approximate_answer(self, plan):
+        """Answer a count, range or combined question approximately"""
+        result = self.run_query(self.get_approximate, plan)
+        
+        if isinstance(result, str):  # Error message
+            return result
+        
+        if plan.intents and not plan.ranges and len(plan.intents) == 1:
+            label = COUNT_INTENTS[plan.intents[0]][0]
+        elif len(plan) == 1:
+            label = f"Students with {plan.describe()[0]}"
+        else:
+            label = "Students matching all conditions"
+        
+        count, error, bound = result['count'], result['count_error'], result['unmatched_bound']
+        if result['exact']:
+            count_text = f"{count:,.0f} (exact)"
+            speech_count = f"{count:,.0f}"
+        elif count == 0:
+            count_text = f"none in the sample; at most {bound:,.0f} (95% upper bound)"
+            speech_count = f"at most {bound:,.0f}"
+        else:
+            count_text = (
+                f"about {count:,.0f} ± {error / count:.1%} "
+                f"(95% CI {max(0, count - error):,.0f}–{count + error + bound:,.0f})"
+            )
+            speech_count = f"about {count:,.0f}"
+        lines = [f"{label}: {count_text}"]
+        if plan.ranges:
+            lines.append(f"Total Amount: about Rs {result['total']:,.0f} ± Rs {result['total_error']:,.0f}")
+            if any(column == '% discount' for column, op, bounds in plan.ranges):
+                lines.append(f"Average Discount: about {result['avg_discount']:.1f}%")
+            for column in dict.fromkeys(column for column, op, bounds in plan.ranges):
+                sketch = self.approx_summary.sketches[column]
+                lines.append(
+                    f"({column} overall: median ≈ {sketch.quantile(0.5):,.0f}, "
+                    f"p90 ≈ {sketch.quantile(0.9):,.0f})"
+                )
+        lines.append(f"(Approximate: stratified sample of {result['sample_rows']:,} rows; type 'exact' for exact answers)")
+        
+        speech_text = f"{label}: {speech_count}"
+        return {"display": "\n".join(lines), "speech": speech_text}
+    
+    def build_compound_answer(self, plan):
+        """Answer a question with several conditions"""
+        result = self.run_query(self.get_compound, plan)
+        
+        if isinstance(result, str):  # Error message
+            return result
+        
+        conditions = plan.describe()
+        order = " -> ".join(f"{step} ({selectivity:.0%})" for step, selectivity in result['steps'])
+        display_text = f"Students matching all conditions: {result['count']}\n"
+        if result['total'] is not None:
+            display_text += f"Total Amount: Rs {result['total']:,.2f}\n"
+        display_text += (
+            f"(Conditions: {'; '.join(conditions)})\n"
+            f"(Evaluated: {order})"
+        )
+        speech_text = f"Students matching all {len(conditions)} conditions: {result['count']}"
+        
+        return {"display": display_text, "speech": speech_text}
+    
+    def build_breakdown_answer(self, intent, column):
+        """Answer a count intent split by the values of a column"""
+        counts = self.run_query(self.get_breakdown, intent, column)
+        
+        if isinstance(counts, str):  # Error message
+            return counts
+        
+        label = COUNT_INTENTS[intent][0]
+        values = ["(blank)" if pd.isna(value) else str(value) for value in counts.index]
+        lines = [f"  {value}: {count}" for value, count in zip(values, counts)]
+        display_text = "\n".join([f"{label} by {column}:"] + lines + [f"  Total: {int(counts.sum())}"])
+        speech_text = f"{label}: " + ", ".join(f"{value} {count}" for value, count in zip(values, counts))
+        
+        return {"display": display_text, "speech": speech_text}
+    
     def run(self):
         """Run chatbot"""
         print("\n" + "="*60)
         print("        Welcome to Physics Wallah")
         print("          Student Query Assistant")
         print("="*60)
+        print("\n" + self.format_load_report())
+        print(self.format_startup_report())
         print("\nAvailable Queries:")
         print("  - Registration: 'registration', 'total students'")
         print("  - Admission: 'admission', 'admitted students'")
@@ -584,9 +3419,16 @@ class StudentQueryBot:
         print("         'fees between 5000 and 10000'")
         print("  - Discount: 'discount more than 50', 'discount less than 30'")
         print("             'discount between 20 and 60'")
-        print("\nType 'exit' to stop")
+        if self.file_indexes:
+            print("  - Per file: add 'by file', e.g. 'admission by file'")
+        print("\nType 'timing' for compute vs speech time per turn, 'latency' for time per stage,")
+        print("'cache' for result cache hits and misses, 'approx' / 'exact' to switch answer mode,")
+        print("'list <question>' / 'more' to page through the students behind an answer,")
+        print("'export <question> to <file.csv|file.jsonl>' to save them,")
+        print("'profile <question>' to profile one question, 'exit' to stop")
         print("="*60 + "\n")
         
+        listing = None
         while True:
             try:
                 question = input("You: ").strip()
@@ -599,7 +3441,52 @@ class StudentQueryBot:
                     self.speak("Goodbye!")
                     break
                 
+                if question.lower() == "timing":
+                    print(f"AI: {self.format_turn_timing()}\n")
+                    continue
+                
+                if question.lower() in ("approx", "exact"):
+                    print(f"AI: {self.set_approximate(question.lower() == 'approx')}\n")
+                    continue
+                
+                if question.lower() == "cache":
+                    print(f"AI: {self.result_cache.format()}\n")
+                    continue
+                
+                if question.lower() == "latency":
+                    print(f"AI: Latency per intent and stage\n{self.latency.format()}\n")
+                    if self.slow_profile:
+                        print(f"Slowest profiled question ({self.slow_profile['seconds'] * 1000:.1f} ms): {self.slow_profile['question']}")
+                        print(self.slow_profile['report'])
+                    continue
+                
+                if question.lower().startswith("profile "):
+                    print(f"AI: Profile of '{question[len('profile '):]}'\n{self.profile_question(question[len('profile '):])}")
+                    continue
+                
+                if question.lower().startswith("list "):
+                    listing = (question[len("list "):], 1)
+                    print(f"AI: {self.format_rows_page(*listing)}\n")
+                    continue
+                
+                if question.lower() == "more" and listing:
+                    listing = (listing[0], listing[1] + 1)
+                    print(f"AI: {self.format_rows_page(*listing)}\n")
+                    continue
+                
+                if question.lower().startswith("export ") and " to " in question:
+                    query, path = question[len("export "):].rsplit(" to ", 1)
+                    written = self.export_rows(query, path.strip())
+                    print(f"AI: {written if isinstance(written, str) else f'Wrote {written} students to {path.strip()}'}\n")
+                    continue
+                
+                if question.lower().endswith(" by file") and self.file_indexes:
+                    print(f"AI: {self.format_answer_by_file(question[:-len(' by file')])}\n")
+                    continue
+                
+                start = time.perf_counter()
                 response = self.answer(question)
+                computed = time.perf_counter()
                 
                 # Handle dict response (with separate display and speech text)
                 if isinstance(response, dict):
@@ -609,14 +3496,289 @@ class StudentQueryBot:
                     print(f"AI: {response}\n")
                     self.speak(response)
                 
+                self.record_turn(computed - start, time.perf_counter() - computed)
+                if self.voice:
+                    self.latency.add(self.trace.intent, 'speech', time.perf_counter() - computed)
+                
             except KeyboardInterrupt:
                 print("\n\nAI: Goodbye!")
                 break
+        
+        # Let the last words finish before the process exits
+        if self.speech and self.speech.thread.is_alive():
+            self.speech.wait_idle(timeout=10)
+            self.speech.close()
+
+
+class QueryServer:
+    """Local HTTP/JSON endpoint for StudentQueryBot.answer() on asyncio
+    All clients share the bot's loaded data. Answers are computed on a thread
+    pool so the event loop keeps accepting and reading requests meanwhile.
+    
+    POST /answer  {"question": "..."} or {"questions": ["...", ...]}
+    GET  /answer?q=...
+    GET  /stats   requests/sec, p50/p99 latency and time per intent and stage
+    """
+    REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+    
+    def __init__(self, bot, host="127.0.0.1", port=8080, workers=4):
+        self.bot = bot
+        self.host = host
+        self.port = port
+        from concurrent.futures import ThreadPoolExecutor
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="answer")
+        self.latencies = collections.deque(maxlen=10000)
+        self.finished = collections.deque(maxlen=100000)
+        self.requests = 0
+        self.errors = 0
+        self.started = None
+    
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection (keep-alive aware)"""
+        import asyncio
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                # Without a usable length the body can't be skipped: answer and close
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = None
+                if length is not None and length < 0:
+                    length = None
+                body = await reader.readexactly(length) if length is not None else b""
+                
+                start = time.perf_counter()
+                parts = request_line.decode("latin-1").split()
+                if length is None:
+                    status, payload = 400, {"error": "bad Content-Length"}
+                elif len(parts) == 3:
+                    status, payload = await self.route(parts[0], parts[1], body)
+                else:
+                    status, payload = 400, {"error": "malformed request line"}
+                
+                keep_alive = (length is not None and len(parts) == 3 and parts[2] == "HTTP/1.1"
+                              and headers.get("connection", "").lower() != "close")
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {self.REASONS[status]}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                self.record(time.perf_counter() - start, status)
+                
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+    
+    async def route(self, method, target, body):
+        """Dispatch a request; returns (status, JSON payload)"""
+        import asyncio
+        import urllib.parse
+        url = urllib.parse.urlsplit(target)
+        
+        if url.path == "/stats":
+            return (200, self.stats()) if method == "GET" else (405, {"error": "use GET"})
+        if url.path != "/answer":
+            return 404, {"error": f"no such endpoint: {url.path}"}
+        
+        if method == "GET":
+            questions = urllib.parse.parse_qs(url.query).get("q", [])[:1]
+            single = True
+        elif method == "POST":
+            try:
+                request = json.loads(body or b"{}")
+            except ValueError:
+                return 400, {"error": "body is not valid JSON"}
+            if not isinstance(request, dict):
+                return 400, {"error": 'body must be a JSON object: {"question": "..."} or {"questions": ["...", ...]}'}
+            if "questions" in request and not (
+                    isinstance(request["questions"], list) and all(isinstance(q, str) for q in request["questions"])):
+                return 400, {"error": '"questions" must be a list of strings'}
+            if "question" in request and not isinstance(request["question"], str):
+                return 400, {"error": '"question" must be a string'}
+            single = "questions" not in request
+            questions = [request["question"]] if single and "question" in request else request.get("questions", [])
+        else:
+            return 405, {"error": "use GET or POST"}
+        
+        questions = [str(question) for question in questions]
+        if not questions:
+            return 400, {"error": "no question given"}
+        
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(self.executor, self.answer_questions, questions)
+        return 200, results[0] if single else {"answers": results}
+    
+    def answer_questions(self, questions):
+        """Answer questions on a worker thread, as JSON-ready dicts"""
+        results = []
+        intents = []
+        responses = self.bot.answer_many(questions, intents)
+        for question, response, intent in zip(questions, responses, intents):
+            result = {"question": question, "intent": intent}
+            if isinstance(response, dict):
+                result.update(response)
+            else:
+                result.update(display=response, speech=response)
+            results.append(result)
+        return results
+    
+    def record(self, seconds, status):
+        """Count a finished request and its latency"""
+        self.requests += 1
+        if status != 200:
+            self.errors += 1
+        self.latencies.append(seconds)
+        self.finished.append(time.perf_counter())
+    
+    def stats(self, window=10.0):
+        """Throughput over the last window seconds, overall throughput and
+        latency percentiles over the last 10,000 requests
+        """
+        now = time.perf_counter()
+        uptime = now - self.started if self.started else 0.0
+        recent = sum(1 for finished in self.finished if now - finished <= window)
+        latencies = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "uptime_seconds": round(uptime, 3),
+            "requests_per_second": round(recent / min(window, uptime), 2) if uptime else 0.0,
+            "requests_per_second_overall": round(self.requests / uptime, 2) if uptime else 0.0,
+            "latency_ms_p50": round(float(np.percentile(latencies, 50)), 3),
+            "latency_ms_p99": round(float(np.percentile(latencies, 99)), 3),
+            "stages": self.bot.latency.summary(),
+            "cache": self.bot.result_cache.stats(),
+        }
+    
+    async def serve(self):
+        """Accept connections until cancelled"""
+        import asyncio
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.started = time.perf_counter()
+        print(f"Serving on http://{self.host}:{self.port} (POST /answer, GET /stats)")
+        async with server:
+            await server.serve_forever()
+    
+    def run(self):
+        """Serve until Ctrl+C, then print the final stats"""
+        import asyncio
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.executor.shutdown(wait=False)
+            print(f"\nServer stats: {json.dumps(self.stats())}")
+
+
+def parse_args():
+    """Parse command line options"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Student Query Assistant")
+    parser.add_argument("csv_path", nargs="?", default="Ay26.csv",
+                        help="student export to query, or a directory/glob of several (quote the glob)")
+    parser.add_argument("--processes", type=int, default=None, help="processes for several files (default: one per core)")
+    parser.add_argument("--engine", default=None, help="pandas CSV parser engine, e.g. pyarrow")
+    parser.add_argument("--no-snapshot", action="store_true", help="don't read or write the .snapshot cache")
+    parser.add_argument("--streaming", action="store_true", help="aggregate the CSV in chunks instead of loading it")
+    parser.add_argument("--chunksize", type=int, default=100000, help="rows per chunk in streaming mode")
+    parser.add_argument("--questions", metavar="JSONL", help="answer questions from a JSONL file instead of the REPL")
+    parser.add_argument("--output", metavar="JSONL", default="-", help="where --questions answers go (default: stdout)")
+    parser.add_argument("--blocking-speech", action="store_true", help="wait for speech to finish after each answer")
+    parser.add_argument("--no-voice", action="store_true", help="headless mode: never start the voice engine")
+    parser.add_argument("--speech-cache", metavar="DIR", help="directory for rendered speech clips (default: .speech_cache)")
+    parser.add_argument("--speech-cache-mb", type=float, default=50, help="size cap for the speech cache in MB")
+    parser.add_argument("--no-speech-cache", action="store_true", help="always synthesize speech")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="answer questions over HTTP/JSON on PORT")
+    parser.add_argument("--host", default="127.0.0.1", help="address for --serve (default: 127.0.0.1)")
+    parser.add_argument("--workers", type=int, default=4, help="answer threads for --serve")
+    parser.add_argument("--watch", nargs="?", type=float, const=5.0, default=None, metavar="SECONDS",
+                        help="reload the CSV when it changes (checked every SECONDS, default 5)")
+    parser.add_argument("--export", metavar="FILE", help="write the students behind --query to FILE (.csv or .jsonl)")
+    parser.add_argument("--query", help="question whose students --export writes, e.g. 'not eligible students'")
+    parser.add_argument("--columns", help="comma-separated columns for --export (default: all)")
+    parser.add_argument("--offset", type=int, default=0, help="matching students to skip for --export")
+    parser.add_argument("--limit", type=int, default=None, help="most students --export writes")
+    parser.add_argument("--approximate", action="store_true",
+                        help="answer from a stratified sample with confidence intervals ('exact' in the chat switches back)")
+    parser.add_argument("--sample-size", type=int, default=500, help="sampled rows per stratum for --approximate")
+    parser.add_argument("--partitions", type=int, metavar="N",
+                        help="evaluate combined questions on N worker processes over shared memory")
+    parser.add_argument("--cache-size", type=int, default=256, help="answers kept in the result cache (0 to disable)")
+    parser.add_argument("--query-log", metavar="JSONL", help="append every question, intent and timing to JSONL")
+    parser.add_argument("--latency-report", metavar="JSON", help="write time per intent and stage to JSON on exit")
+    parser.add_argument("--profile-slow", type=float, metavar="MS",
+                        help="profile answers and keep the slowest one over MS (shown by 'latency')")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
     try:
-        bot = StudentQueryBot("Ay26.csv")
+        args = parse_args()
+        speech_cache = {}
+        if args.no_speech_cache:
+            speech_cache = {'speech_cache': None}
+        elif args.speech_cache:
+            speech_cache = {'speech_cache': args.speech_cache}
+        bot = StudentQueryBot(args.csv_path, engine=args.engine, snapshot=not args.no_snapshot,
+                              streaming=args.streaming, chunksize=args.chunksize,
+                              async_speech=not args.blocking_speech, voice=not args.no_voice,
+                              processes=args.processes,
+                              profile_slow=args.profile_slow / 1000 if args.profile_slow is not None else None,
+                              cache_size=args.cache_size, approximate=args.approximate,
+                              sample_per_stratum=args.sample_size, speech_cache_mb=args.speech_cache_mb,
+                              partitions=args.partitions, query_log=args.query_log, **speech_cache)
+        if args.latency_report:
+            atexit.register(bot.latency.export, args.latency_report)
+        
+        if args.export:
+            columns = [column.strip() for column in args.columns.split(",")] if args.columns else None
+            output = sys.stdout if args.export == "-" else args.export
+            written = bot.export_rows(args.query or "", output, columns=columns, offset=args.offset, limit=args.limit)
+            if isinstance(written, str):
+                print(written, file=sys.stderr)
+                sys.exit(1)
+            print(f"Wrote {written} students", file=sys.stderr)
+            sys.exit(0)
+        
+        if args.questions:
+            import contextlib
+            print(bot.format_startup_report(), file=sys.stderr)
+            with open(args.questions, encoding="utf-8") as questions:
+                if args.output == "-":
+                    # Keep stdout for the answers; other messages go to stderr
+                    answers = sys.stdout
+                    with contextlib.redirect_stdout(sys.stderr):
+                        bot.answer_jsonl(questions, answers)
+                else:
+                    with open(args.output, "w", encoding="utf-8") as output:
+                        bot.answer_jsonl(questions, output)
+            sys.exit(0)
+        
+        if args.watch:
+            bot.start_watching(args.watch)
+        
+        if args.serve:
+            QueryServer(bot, args.host, args.serve, args.workers).run()
+            sys.exit(0)
+        
         bot.run()
     except Exception as e:
         print(f"Fatal error: {e}")